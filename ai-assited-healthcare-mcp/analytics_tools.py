@@ -5,7 +5,7 @@ Analytics tools for healthcare assessment data analysis
 import pandas as pd
 from typing import Dict, Any, List
 from fastmcp import FastMCP
-from config import supabase, HEALTHCARE_TABLES
+from config import get_supabase, HEALTHCARE_TABLES
 
 
 def create_analytics_tools(mcp: FastMCP):
@@ -102,7 +102,7 @@ def create_analytics_tools(mcp: FastMCP):
 
                 # Get all assessments for this patient
                 result = (
-                    supabase.table(table_name)
+                    get_supabase().table(table_name)
                     .select("*")
                     .eq("group_identifier", patient_id)
                     .order("assessment_date", desc=False)
@@ -208,7 +208,7 @@ def create_analytics_tools(mcp: FastMCP):
 
             # PTSD Risk Assessment
             ptsd_result = (
-                supabase.table(HEALTHCARE_TABLES["ptsd"])
+                get_supabase().table(HEALTHCARE_TABLES["ptsd"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -255,7 +255,7 @@ def create_analytics_tools(mcp: FastMCP):
 
             # PHQ-9 Risk Assessment
             phq_result = (
-                supabase.table(HEALTHCARE_TABLES["phq"])
+                get_supabase().table(HEALTHCARE_TABLES["phq"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -309,7 +309,7 @@ def create_analytics_tools(mcp: FastMCP):
 
             # GAD-7 Risk Assessment
             gad_result = (
-                supabase.table(HEALTHCARE_TABLES["gad"])
+                get_supabase().table(HEALTHCARE_TABLES["gad"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -359,7 +359,7 @@ def create_analytics_tools(mcp: FastMCP):
 
             # WHO-5 Wellbeing Assessment (reverse scoring - lower is worse)
             who_result = (
-                supabase.table(HEALTHCARE_TABLES["who"])
+                get_supabase().table(HEALTHCARE_TABLES["who"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -411,7 +411,7 @@ def create_analytics_tools(mcp: FastMCP):
 
             # Substance Use Risk Assessment
             substance_result = (
-                supabase.table(HEALTHCARE_TABLES["substance_history"])
+                get_supabase().table(HEALTHCARE_TABLES["substance_history"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .execute()
@@ -517,7 +517,7 @@ def create_analytics_tools(mcp: FastMCP):
 
             # Get patient's latest assessment
             patient_result = (
-                supabase.table(table_name)
+                get_supabase().table(table_name)
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -531,7 +531,7 @@ def create_analytics_tools(mcp: FastMCP):
                 }
 
             # Get all population data
-            population_result = supabase.table(table_name).select("*").execute()
+            population_result = get_supabase().table(table_name).select("*").execute()
 
             if not population_result.data:
                 return {"error": f"No population data available for {assessment_type}"}
@@ -621,7 +621,7 @@ def create_analytics_tools(mcp: FastMCP):
                 table_name = HEALTHCARE_TABLES[assessment_type]
 
                 # Get latest assessments for all patients
-                result = supabase.table(table_name).select("*").execute()
+                result = get_supabase().table(table_name).select("*").execute()
 
                 if not result.data:
                     continue
@@ -6,7 +6,7 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import pandas as pd
 from fastmcp import FastMCP
-from config import supabase, HEALTHCARE_TABLES
+from config import get_supabase, HEALTHCARE_TABLES
 
 
 def create_assessment_tools(mcp: FastMCP):
@@ -144,7 +144,7 @@ def create_assessment_tools(mcp: FastMCP):
         """
         try:
             query = (
-                supabase.table(HEALTHCARE_TABLES["ptsd"])
+                get_supabase().table(HEALTHCARE_TABLES["ptsd"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -202,7 +202,7 @@ def create_assessment_tools(mcp: FastMCP):
         """
         try:
             query = (
-                supabase.table(HEALTHCARE_TABLES["phq"])
+                get_supabase().table(HEALTHCARE_TABLES["phq"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -260,7 +260,7 @@ def create_assessment_tools(mcp: FastMCP):
         """
         try:
             query = (
-                supabase.table(HEALTHCARE_TABLES["gad"])
+                get_supabase().table(HEALTHCARE_TABLES["gad"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -318,7 +318,7 @@ def create_assessment_tools(mcp: FastMCP):
         """
         try:
             query = (
-                supabase.table(HEALTHCARE_TABLES["who"])
+                get_supabase().table(HEALTHCARE_TABLES["who"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -382,13 +382,13 @@ def create_assessment_tools(mcp: FastMCP):
         try:
             # Check both DERS tables
             ders1_query = (
-                supabase.table(HEALTHCARE_TABLES["ders"])
+                get_supabase().table(HEALTHCARE_TABLES["ders"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
             )
             ders2_query = (
-                supabase.table(HEALTHCARE_TABLES["ders2"])
+                get_supabase().table(HEALTHCARE_TABLES["ders2"])
                 .select("*")
                 .eq("group_identifier", patient_id)
                 .order("assessment_date", desc=True)
@@ -476,13 +476,13 @@ def create_assessment_tools(mcp: FastMCP):
                     # Handle DERS separately (both versions)
                     try:
                         ders1_result = (
-                            supabase.table(HEALTHCARE_TABLES["ders"])
+                            get_supabase().table(HEALTHCARE_TABLES["ders"])
                             .select("*")
                             .eq("group_identifier", patient_id)
                             .order("assessment_date", desc=True)
                         )
                         ders2_result = (
-                            supabase.table(HEALTHCARE_TABLES["ders2"])
+                            get_supabase().table(HEALTHCARE_TABLES["ders2"])
                             .select("*")
                             .eq("group_identifier", patient_id)
                             .order("assessment_date", desc=True)
@@ -563,7 +563,7 @@ def create_assessment_tools(mcp: FastMCP):
                     table_name = HEALTHCARE_TABLES[assessment_type]
                     try:
                         query = (
-                            supabase.table(table_name)
+                            get_supabase().table(table_name)
                             .select("*")
                             .eq("group_identifier", patient_id)
                             .order("assessment_date", desc=True)
@@ -674,7 +674,7 @@ def create_assessment_tools(mcp: FastMCP):
             for table_name in HEALTHCARE_TABLES.values():
                 try:
                     result = (
-                        supabase.table(table_name).select("group_identifier").execute()
+                        get_supabase().table(table_name).select("group_identifier").execute()
                     )
                     if result.data:
                         for record in result.data:
@@ -709,7 +709,7 @@ def create_assessment_tools(mcp: FastMCP):
             for assessment_type, table_name in HEALTHCARE_TABLES.items():
                 try:
                     result = (
-                        supabase.table(table_name).select("group_identifier").execute()
+                        get_supabase().table(table_name).select("group_identifier").execute()
                     )
                     if result.data:
                         unique_patients = len(
@@ -3,12 +3,24 @@ Configuration module for Healthcare MCP Server
 """
 
 import os
+import httpx
+from functools import lru_cache
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from typing import Optional
 
+from logging_config import get_logger
+
 load_dotenv()
 
+logger = get_logger("config")
+
+# Keep-alive connection pool shared by every Supabase request in the process
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0
+)
+HTTP_TIMEOUT_SECONDS = 30
+
 
 class SupabaseConfig:
     """Supabase database configuration"""
@@ -30,7 +42,43 @@ class SupabaseConfig:
             if use_service_role and self.service_role_key
             else self.key
         )
-        return create_client(self.url, key)  # type: ignore
+        http_client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                limits=HTTP_POOL_LIMITS, retries=2, http2=True
+            ),
+            timeout=HTTP_TIMEOUT_SECONDS,
+            follow_redirects=True,
+        )
+        try:
+            options = ClientOptions(httpx_client=http_client)
+        except TypeError:
+            # Older supabase releases cannot take an httpx client and pool
+            # connections inside their own
+            http_client.close()
+            options = ClientOptions(postgrest_client_timeout=HTTP_TIMEOUT_SECONDS)
+        return create_client(self.url, key, options=options)
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    """Read an on/off setting, falling back to ``default`` on unknown values
+
+    true/yes/on and false/no/off are accepted, as is an integer, which is
+    on when positive.
+    """
+    value = (os.getenv(name) or "").strip().lower()
+    if not value:
+        return default
+    if value in ("true", "yes", "on"):
+        return True
+    if value in ("false", "no", "off"):
+        return False
+    try:
+        return int(value) > 0
+    except ValueError:
+        logger.warning(
+            "Ignoring invalid setting", variable=name, value=value, default=default
+        )
+        return default
 
 
 class MCPConfig:
@@ -39,14 +87,34 @@ class MCPConfig:
     def __init__(self):
         self.name = os.getenv("MCP_SERVER_NAME", "healthcare-dashboard")
         self.version = os.getenv("MCP_SERVER_VERSION", "1.0.0")
+        # Resource responses are compact unless pretty-printed for debugging;
+        # orjson only indents by two spaces, so this is an on/off flag
+        self.pretty_json = _env_flag("MCP_JSON_INDENT")
 
 
 # Global configuration instances
-supabase_config = SupabaseConfig()
 mcp_config = MCPConfig()
 
-# Create default Supabase client
-supabase: Client = supabase_config.create_client()
+
+@lru_cache(maxsize=1)
+def get_supabase_config() -> SupabaseConfig:
+    """Supabase configuration, read from the environment on first use"""
+    return SupabaseConfig()
+
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Default Supabase client, created on first use and reused by the process"""
+    return get_supabase_config().create_client()
+
+
+def __getattr__(name: str):
+    """Resolve the ``supabase`` and ``supabase_config`` globals lazily"""
+    if name == "supabase":
+        return get_supabase()
+    if name == "supabase_config":
+        return get_supabase_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Healthcare table names in your Supabase database (updated to match actual table names)
 HEALTHCARE_TABLES = {
@@ -63,3 +131,14 @@ HEALTHCARE_TABLES = {
     "ahcm": "AHCM",
     "stat_tests": "STATS TEST",
 }
+
+# Materialized views holding the latest assessment per patient (see database-views.sql)
+LATEST_ASSESSMENT_VIEWS = {
+    "ptsd": "ptsd_latest",
+    "phq": "phq_latest",
+    "gad": "gad_latest",
+    "who": "who_latest",
+}
+
+# View listing every patient with a PTSD, PHQ or GAD assessment (see database-views.sql)
+ALL_PATIENT_IDS_VIEW = "all_patient_ids"
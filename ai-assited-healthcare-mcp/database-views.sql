@@ -0,0 +1,282 @@
+-- Healthcare MCP Server materialized views and functions
+-- Run these in Supabase SQL Editor; resources fall back to the base tables
+-- until these objects exist
+
+-- 1. Stored total scores (missing or non-numeric answers count as 0), read by
+-- the high-risk resource; run before creating the views so they include them
+ALTER TABLE "PTSD" ADD COLUMN ptsd_total numeric GENERATED ALWAYS AS (
+    coalesce(ptsd_q1_disturbing_memories, 0) +
+    coalesce(ptsd_q2_disturbing_dreams, 0) +
+    CASE WHEN ptsd_q3_reliving_experience ~ '^\s*[0-9]+(\.[0-9]+)?\s*$' THEN ptsd_q3_reliving_experience::numeric ELSE 0 END +
+    coalesce(ptsd_q4_upset_reminders, 0) +
+    coalesce(ptsd_q5_physical_reactions, 0) +
+    coalesce(ptsd_q6_avoiding_memories, 0) +
+    coalesce(ptsd_q7_avoiding_reminders, 0) +
+    coalesce(ptsd_q8_memory_trouble, 0) +
+    coalesce(ptsd_q9_negative_beliefs, 0) +
+    coalesce(ptsd_q10_blaming_self_others, 0) +
+    coalesce(ptsd_q11_negative_feelings, 0) +
+    CASE WHEN ptsd_q12_loss_interest ~ '^\s*[0-9]+(\.[0-9]+)?\s*$' THEN ptsd_q12_loss_interest::numeric ELSE 0 END +
+    coalesce(ptsd_q13_feeling_distant, 0) +
+    coalesce(ptsd_q14_trouble_positive_feelings, 0) +
+    coalesce(ptsd_q15_irritable_behavior, 0) +
+    coalesce(ptsd_q16_risky_behavior, 0) +
+    coalesce(ptsd_q17_hypervigilant, 0) +
+    coalesce(ptsd_q18_easily_startled, 0) +
+    coalesce(ptsd_q19_concentration_difficulty, 0) +
+    coalesce(ptsd_q20_sleep_trouble, 0)
+) STORED;
+
+ALTER TABLE "PHQ" ADD COLUMN phq_total numeric GENERATED ALWAYS AS (
+    coalesce(col_1_little_interest_or_pleasure_in_doing_things, 0) +
+    coalesce(col_2_feeling_down_depressed_or_hopeless, 0) +
+    coalesce(col_3_trouble_falling_or_staying_asleep_or_sleeping_too_much, 0) +
+    coalesce(col_4_feeling_tired_or_having_little_energy, 0) +
+    coalesce(col_5_poor_appetite_or_overeating, 0) +
+    coalesce(col_6_feeling_bad_about_yourself_or_that_you_are_failure_or_hav, 0) +
+    coalesce(col_7_trouble_concentrating_on_things_such_as_reading_the_newsp, 0) +
+    coalesce(col_8_moving_or_speaking_so_slowly_that_other_people_could_have, 0) +
+    coalesce(col_9_thoughts_that_you_would_be_better_off_dead_or_of_hurting_, 0)
+) STORED;
+
+ALTER TABLE "GAD" ADD COLUMN gad_total numeric GENERATED ALWAYS AS (
+    coalesce(col_1_feeling_nervous_anxious_or_on_edge, 0) +
+    coalesce(col_2_not_being_able_to_stop_or_control_worrying, 0) +
+    coalesce(col_3_worrying_too_much_about_different_things, 0) +
+    coalesce(col_4_trouble_relaxing, 0) +
+    coalesce(col_5_being_so_restless_that_it_is_too_hard_to_sit_still, 0) +
+    CASE WHEN col_5_being_so_restless_that_its_hard_to_sit_still ~ '^\s*[0-9]+(\.[0-9]+)?\s*$' THEN col_5_being_so_restless_that_its_hard_to_sit_still::numeric ELSE 0 END +
+    coalesce(col_6_becoming_easily_annoyed_or_irritable, 0) +
+    coalesce(col_7_feeling_afraid_as_if_something_awful_might_happen, 0)
+) STORED;
+
+-- 2. Latest assessment per patient, read by latest-scores and high-risk resources
+CREATE MATERIALIZED VIEW ptsd_latest AS
+    SELECT DISTINCT ON (group_identifier) *
+    FROM "PTSD"
+    WHERE group_identifier IS NOT NULL
+    ORDER BY group_identifier, assessment_date DESC;
+
+CREATE MATERIALIZED VIEW phq_latest AS
+    SELECT DISTINCT ON (group_identifier) *
+    FROM "PHQ"
+    WHERE group_identifier IS NOT NULL
+    ORDER BY group_identifier, assessment_date DESC;
+
+CREATE MATERIALIZED VIEW gad_latest AS
+    SELECT DISTINCT ON (group_identifier) *
+    FROM "GAD"
+    WHERE group_identifier IS NOT NULL
+    ORDER BY group_identifier, assessment_date DESC;
+
+CREATE MATERIALIZED VIEW who_latest AS
+    SELECT DISTINCT ON (group_identifier) *
+    FROM "WHO"
+    WHERE group_identifier IS NOT NULL
+    ORDER BY group_identifier, assessment_date DESC;
+
+-- 3. Unique indexes, required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX idx_ptsd_latest_patient ON ptsd_latest (group_identifier);
+CREATE UNIQUE INDEX idx_phq_latest_patient ON phq_latest (group_identifier);
+CREATE UNIQUE INDEX idx_gad_latest_patient ON gad_latest (group_identifier);
+CREATE UNIQUE INDEX idx_who_latest_patient ON who_latest (group_identifier);
+
+-- Severity screens filter the latest totals by threshold
+CREATE INDEX idx_ptsd_latest_total ON ptsd_latest (ptsd_total);
+CREATE INDEX idx_phq_latest_total ON phq_latest (phq_total);
+CREATE INDEX idx_gad_latest_total ON gad_latest (gad_total);
+
+-- 4. Nightly refresh with pg_cron (enable the extension under Database > Extensions)
+SELECT cron.schedule(
+    'refresh-latest-assessments',
+    '0 3 * * *',
+    $$
+    REFRESH MATERIALIZED VIEW CONCURRENTLY ptsd_latest;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY phq_latest;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY gad_latest;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY who_latest;
+    $$
+);
+
+-- 5. Population statistics per assessment table, read by the statistics resource
+-- over RPC so raw rows never leave the database; covers the numeric columns
+CREATE OR REPLACE FUNCTION assessment_stats(assessment_table text)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+SET search_path = public
+AS $$
+DECLARE
+    numeric_column text;
+    column_stats jsonb;
+    statistics jsonb := '{}'::jsonb;
+    summary jsonb;
+BEGIN
+    IF assessment_table NOT IN ('PTSD', 'PHQ', 'GAD', 'WHO') THEN
+        RAISE EXCEPTION 'Unsupported assessment table: %', assessment_table;
+    END IF;
+
+    EXECUTE format(
+        'SELECT jsonb_build_object(
+             ''total_records'', count(*),
+             ''unique_patients'', count(DISTINCT group_identifier)
+         ) FROM %I',
+        assessment_table
+    ) INTO summary;
+
+    FOR numeric_column IN
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'public'
+          AND table_name = assessment_table
+          AND data_type IN ('smallint', 'integer', 'bigint', 'numeric', 'real', 'double precision')
+        ORDER BY ordinal_position
+    LOOP
+        EXECUTE format(
+            'SELECT jsonb_build_object(
+                 ''count'', count(v),
+                 ''mean'', round(avg(v)::numeric, 2),
+                 ''median'', round(percentile_cont(0.5) WITHIN GROUP (ORDER BY v)::numeric, 2),
+                 ''std'', round(stddev_samp(v)::numeric, 2),
+                 ''min'', min(v),
+                 ''max'', max(v),
+                 ''percentiles'', jsonb_build_object(
+                     ''25th'', round(percentile_cont(0.25) WITHIN GROUP (ORDER BY v)::numeric, 2),
+                     ''75th'', round(percentile_cont(0.75) WITHIN GROUP (ORDER BY v)::numeric, 2),
+                     ''90th'', round(percentile_cont(0.90) WITHIN GROUP (ORDER BY v)::numeric, 2),
+                     ''95th'', round(percentile_cont(0.95) WITHIN GROUP (ORDER BY v)::numeric, 2)
+                 )
+             )
+             FROM (SELECT %I::float8 AS v FROM %I WHERE %I IS NOT NULL) AS answered
+             HAVING count(v) > 0',
+            numeric_column, assessment_table, numeric_column
+        ) INTO column_stats;
+
+        IF column_stats IS NOT NULL THEN
+            statistics := statistics || jsonb_build_object(numeric_column, column_stats);
+        END IF;
+    END LOOP;
+
+    RETURN summary || jsonb_build_object('statistics', statistics);
+END;
+$$;
+
+-- 6. Distinct patients across the screened assessments, read by the high-risk
+-- resource so only one row per patient is transferred
+CREATE VIEW all_patient_ids AS
+    SELECT group_identifier FROM "PTSD" WHERE group_identifier IS NOT NULL
+    UNION
+    SELECT group_identifier FROM "PHQ" WHERE group_identifier IS NOT NULL
+    UNION
+    SELECT group_identifier FROM "GAD" WHERE group_identifier IS NOT NULL;
+
+-- 7. Substance risk indicators per patient, read by get_high_risk_substance_users;
+-- keep the substance and pattern lists in sync with substance_tools.py. Only
+-- patients using a high-risk substance or with a daily/continued pattern can
+-- reach the risk threshold, so only they are returned
+CREATE OR REPLACE FUNCTION high_risk_substance_users()
+RETURNS TABLE (
+    group_identifier text,
+    substance_count bigint,
+    active_substances text[],
+    uses_high_risk_substance boolean,
+    has_daily_use boolean
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    SELECT *
+    FROM (
+        SELECT
+            s.group_identifier,
+            count(*) AS substance_count,
+            array_agg(s.substance) AS active_substances,
+            coalesce(bool_or(s.substance = ANY (ARRAY[
+                'Heroin', 'Cocaine (Powder)', 'Crack Cocaine', 'Crystal Meth',
+                'Methadone', 'Oxycontin', 'Other Opiates'
+            ])), false) AS uses_high_risk_substance,
+            coalesce(bool_or(lower(s.pattern_of_use) = ANY (ARRAY[
+                'daily', 'continued', 'continual'
+            ])), false) AS has_daily_use
+        FROM "Patient Substance History" AS s
+        WHERE s.use_flag = 1
+        GROUP BY s.group_identifier
+    ) AS indicators
+    WHERE indicators.uses_high_risk_substance OR indicators.has_daily_use;
+$$;
+
+-- 8. Population substance use summary, read by
+-- analyze_substance_patterns_across_patients so only aggregates leave the
+-- database. Returns json rather than jsonb so the count-ordered substance
+-- and pattern keys keep their order
+CREATE OR REPLACE FUNCTION substance_population_stats()
+RETURNS json
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    WITH active AS (
+        SELECT group_identifier, substance, pattern_of_use
+        FROM "Patient Substance History"
+        WHERE use_flag = 1
+    ),
+    patient_use AS (
+        SELECT
+            group_identifier,
+            count(*) AS active_substance_count,
+            count(*) FILTER (WHERE lower(pattern_of_use) = 'daily') AS daily_use_count
+        FROM active
+        GROUP BY group_identifier
+    ),
+    substance_counts AS (
+        SELECT substance, count(*) AS n
+        FROM active
+        GROUP BY substance
+        ORDER BY n DESC, substance
+        LIMIT 10
+    ),
+    pattern_counts AS (
+        SELECT pattern_of_use, count(*) AS n
+        FROM active
+        WHERE pattern_of_use IS NOT NULL
+        GROUP BY pattern_of_use
+    )
+    SELECT json_build_object(
+        'population_analysis', (
+            SELECT json_build_object(
+                'total_patients', count(DISTINCT s.group_identifier),
+                'total_substance_records', count(*),
+                'patients_with_active_use', (SELECT count(*) FROM patient_use),
+                'high_risk_patients', (
+                    SELECT count(*) FROM patient_use
+                    WHERE active_substance_count >= 3 OR daily_use_count >= 1
+                )
+            )
+            FROM "Patient Substance History" AS s
+        ),
+        'most_common_substances', (
+            SELECT coalesce(json_object_agg(substance, n ORDER BY n DESC, substance), '{}'::json)
+            FROM substance_counts
+        ),
+        'usage_patterns', (
+            SELECT coalesce(json_object_agg(pattern_of_use, n ORDER BY n DESC, pattern_of_use), '{}'::json)
+            FROM pattern_counts
+        ),
+        'risk_indicators', (
+            SELECT json_build_object(
+                'patients_with_multiple_substances', count(*) FILTER (WHERE active_substance_count >= 3),
+                'patients_with_daily_use', count(*) FILTER (WHERE daily_use_count >= 1),
+                'average_substances_per_patient', round(avg(active_substance_count), 2)
+            )
+            FROM patient_use
+        )
+    );
+$$;
+
+-- NOTES:
+-- - Views are refreshed nightly, so "latest" can lag same-day uploads
+-- - CONCURRENTLY keeps the views readable while they refresh
+-- - Views created before the total columns existed must be dropped and
+--   recreated to pick them up; until then high-risk sums question columns
+-- - assessment_stats reads the live tables, so statistics never lag
@@ -5,7 +5,7 @@ Enhanced Assessment tools with pagination and caching for Healthcare MCP Server
 from typing import Dict, Any, Optional
 from datetime import datetime
 from fastmcp import FastMCP
-from config import supabase, HEALTHCARE_TABLES
+from config import get_supabase, HEALTHCARE_TABLES
 from models import PatientIdRequest, PaginationRequest, AssessmentRequest, PatientListRequest
 from pagination_caching import paginate_supabase_query, cached, get_total_count, paginate_list
 from logging_config import get_logger, RequestLogger
@@ -166,7 +166,7 @@ def create_enhanced_assessment_tools(mcp: FastMCP):
                     req_logger.log_info("Computing statistics (not cached)", assessment=assessment)
                     
                     # Get all assessment data
-                    result = supabase.table(table_name).select("*").execute()
+                    result = get_supabase().table(table_name).select("*").execute()
                     
                     if not result.data:
                         return {
@@ -266,7 +266,7 @@ def create_enhanced_assessment_tools(mcp: FastMCP):
                 table_name = HEALTHCARE_TABLES[assessment_type.lower()]
                 
                 # Get all data and calculate scores (this could be optimized with database views)
-                result = supabase.table(table_name).select("*").execute()
+                result = get_supabase().table(table_name).select("*").execute()
                 
                 if not result.data:
                     return {
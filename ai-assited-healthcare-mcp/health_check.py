@@ -7,13 +7,16 @@ import psutil
 from datetime import datetime, timedelta
 from typing import Dict, Any
 from fastmcp import FastMCP
-from config import supabase, HEALTHCARE_TABLES, mcp_config
+from config import get_supabase, HEALTHCARE_TABLES, mcp_config
 from models import HealthCheckRequest, HealthCheckResponse
 from logging_config import get_logger, RequestLogger
 
 # Store server startup time
 SERVER_START_TIME = datetime.utcnow()
 
+# Clock used to time dependency checks; tests replace it with a plain callable
+_clock = time.time
+
 def create_health_check_tools(mcp: FastMCP):
     """Create health check tools for monitoring"""
     
@@ -89,12 +92,12 @@ def create_health_check_tools(mcp: FastMCP):
                 req_logger.log_info("Checking database connectivity")
                 
                 try:
-                    start_time = time.time()
+                    start_time = _clock()
                     
                     # Test basic connectivity
-                    result = supabase.table(HEALTHCARE_TABLES["ptsd"]).select("count").limit(1).execute()
+                    result = get_supabase().table(HEALTHCARE_TABLES["ptsd"]).select("count").limit(1).execute()
                     
-                    db_response_time = time.time() - start_time
+                    db_response_time = _clock() - start_time
                     
                     if db_response_time > 5.0:
                         db_status = "warning"
@@ -128,9 +131,9 @@ def create_health_check_tools(mcp: FastMCP):
                     table_checks = {}
                     for table_key, table_name in HEALTHCARE_TABLES.items():
                         try:
-                            start_time = time.time()
-                            result = supabase.table(table_name).select("*").limit(1).execute()
-                            response_time = time.time() - start_time
+                            start_time = _clock()
+                            result = get_supabase().table(table_name).select("*").limit(1).execute()
+                            response_time = _clock() - start_time
                             
                             table_checks[table_key] = {
                                 "status": "accessible",
@@ -142,7 +145,9 @@ def create_health_check_tools(mcp: FastMCP):
                                 "status": "error", 
                                 "message": str(e)
                             }
-                            health_status["status"] = "degraded"
+                            # A failed connectivity check already made it unhealthy
+                            if health_status["status"] != "unhealthy":
+                                health_status["status"] = "degraded"
                     
                     health_status["checks"]["tables"] = table_checks
                     
@@ -151,7 +156,8 @@ def create_health_check_tools(mcp: FastMCP):
                         "status": "error",
                         "message": f"Table accessibility check failed: {str(e)}"
                     }
-                    health_status["status"] = "degraded"
+                    if health_status["status"] != "unhealthy":
+                        health_status["status"] = "degraded"
             
             # Performance metrics
             if include_performance_metrics:
@@ -9,9 +9,10 @@ from assessment_tools import create_assessment_tools
 from enhanced_assessment_tools import create_enhanced_assessment_tools
 from substance_tools import create_substance_tools
 from analytics_tools import create_analytics_tools
-from resources import create_patient_resources
+from resources import create_patient_resources, dumps_json
 from motivation_tools import create_motivation_tools
 from health_check import create_health_check_tools
+from pagination_caching import start_cache_warming
 from logging_config import get_logger
 
 
@@ -32,6 +33,8 @@ def create_heatlhcare_mcp():
                         """,
         version=mcp_config.version,
         stateless_http=True,
+        # Encode tool results with orjson instead of the default serializer
+        tool_serializer=dumps_json,
     )
     mcp = create_assessment_tools(mcp)
     mcp = create_enhanced_assessment_tools(mcp)
@@ -100,6 +103,7 @@ def main():
 
         resource_patterns = [
             "patient://{patient_id}/complete-profile",
+            "patient://{patient_id}/complete-profile/history",
             "assessment://{assessment_type}/latest-scores",
             "trends://{patient_id}/{timeframe}",
             "population://{assessment_type}/statistics", 
@@ -119,6 +123,9 @@ def main():
             server_url=f"http://{host}:{port}"
         )
 
+        # Warm common queries in the background while the server starts
+        start_cache_warming()
+
         # Start the HTTP server
         server.run(transport="http", host=host, port=port)
 
@@ -2,9 +2,10 @@
 Pydantic models for input validation in Healthcare MCP Server
 """
 
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Union
 from datetime import datetime, date
-from pydantic import BaseModel, validator, Field
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
+from pydantic_core import PydanticCustomError
 from enum import Enum
 
 
@@ -20,14 +21,20 @@ class AssessmentType(str, Enum):
 
 class PatientIdRequest(BaseModel):
     """Basic patient ID validation"""
+    model_config = ConfigDict(frozen=True)
+    
     patient_id: str = Field(..., min_length=2, max_length=50, description="Patient identifier")
     
-    @validator('patient_id')
+    @field_validator('patient_id', mode='before')
+    @classmethod
     def validate_patient_id(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Patient ID cannot be empty')
+        if not isinstance(v, str):
+            return v
+        v = v.strip()
+        if not v:
+            raise PydanticCustomError('patient_id_empty', 'Patient ID cannot be empty')
         # Convert to uppercase for consistency
-        return v.strip().upper()
+        return v.upper()
 
 
 class AssessmentRequest(PatientIdRequest):
@@ -38,8 +45,15 @@ class AssessmentRequest(PatientIdRequest):
 
 class PaginationRequest(BaseModel):
     """Pagination parameters"""
+    model_config = ConfigDict(frozen=True)
+    
     page: int = Field(default=1, ge=1, description="Page number (starts from 1)")
     page_size: int = Field(default=50, ge=1, le=500, description="Number of records per page")
+    cursor_key: str = Field(default="unique_id", description="Column used for keyset (cursor) pagination")
+    cursor_value: Optional[Union[int, str]] = Field(
+        None,
+        description="Last-seen cursor_key value; when set, keyset pagination replaces page offsets"
+    )
     
     @property
     def offset(self) -> int:
@@ -55,14 +69,17 @@ class PatientListRequest(PaginationRequest):
 
 class DateRangeFilter(BaseModel):
     """Date range filtering"""
+    model_config = ConfigDict(frozen=True)
+    
     start_date: Optional[date] = Field(None, description="Start date for filtering")
     end_date: Optional[date] = Field(None, description="End date for filtering")
     
-    @validator('end_date')
-    def validate_date_range(cls, v, values):
-        if v and 'start_date' in values and values['start_date']:
-            if v < values['start_date']:
-                raise ValueError('End date must be after start date')
+    @field_validator('end_date')
+    @classmethod
+    def validate_date_range(cls, v, info: ValidationInfo):
+        start_date = info.data.get('start_date')
+        if v and start_date and v < start_date:
+            raise PydanticCustomError('date_range_invalid', 'End date must be after start date')
         return v
 
 
@@ -87,20 +104,25 @@ class RiskAssessmentRequest(PatientIdRequest):
 
 class SubstanceAnalysisRequest(BaseModel):
     """Request for substance use analysis"""
+    model_config = ConfigDict(frozen=True)
+    
     patient_id: Optional[str] = Field(None, description="Specific patient ID (optional for population analysis)")
     substance_types: Optional[List[str]] = Field(None, description="Filter by substance types")
     active_only: bool = Field(default=True, description="Only include active substance use")
     include_patterns: bool = Field(default=True, description="Include usage pattern analysis")
     
-    @validator('patient_id')
+    @field_validator('patient_id', mode='before')
+    @classmethod
     def validate_patient_id(cls, v):
-        if v:
+        if isinstance(v, str) and v:
             return v.strip().upper()
         return v
 
 
 class PopulationStatsRequest(BaseModel):
     """Request for population statistics"""
+    model_config = ConfigDict(frozen=True)
+    
     assessment_type: AssessmentType = Field(..., description="Assessment type for statistics")
     include_demographics: bool = Field(default=False, description="Include demographic breakdowns")
     date_range: Optional[DateRangeFilter] = Field(None, description="Date range filter")
@@ -109,6 +131,8 @@ class PopulationStatsRequest(BaseModel):
 
 class HealthCheckRequest(BaseModel):
     """Request for health check"""
+    model_config = ConfigDict(frozen=True)
+    
     include_dependencies: bool = Field(default=True, description="Check external dependencies")
     include_performance_metrics: bool = Field(default=False, description="Include performance metrics")
     timeout_seconds: int = Field(default=30, ge=5, le=120, description="Timeout for dependency checks")
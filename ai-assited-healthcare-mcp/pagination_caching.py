@@ -2,130 +2,236 @@
 Pagination and caching utilities for Healthcare MCP Server
 """
 
+from collections import OrderedDict
 from functools import lru_cache, wraps
-from typing import Dict, Any, List, Optional, Tuple
+from itertools import islice
+from typing import Dict, Any, Hashable, Iterator, List, Literal, Optional, Sequence, Tuple
+import asyncio
 import hashlib
 import json
-from datetime import datetime, timedelta
+import logging
+import os
+import random
+import time
 from dataclasses import dataclass
 import threading
-from config import supabase
+import numpy as np
+import pandas as pd
+from config import get_supabase, HEALTHCARE_TABLES
 from models import PaginationRequest, PaginatedResponse
 from logging_config import get_logger
 
 logger = get_logger("pagination_caching")
 
+try:
+    import xxhash
+except ImportError:  # xxhash is an optional, faster key hash
+    xxhash = None
+
+# Cache keys only index a dict, so a non-cryptographic hash is enough.
+# Set CACHE_HASH_ALGO=md5 to keep the previous key format.
+HASH_ALGO = os.getenv("CACHE_HASH_ALGO", "xxh3").lower()
+
+
+def _hash_key_string(key_string: str) -> str:
+    """Hash a serialized cache key"""
+    key_bytes = key_string.encode()
+    if HASH_ALGO == "xxh3" and xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(key_bytes)
+    return hashlib.md5(key_bytes).hexdigest()
+
+# Sentinel distinguishing a cache miss from a cached None
+_MISSING = object()
+
 # Thread-safe cache with TTL support
 class TTLCache:
-    """Time-to-live cache implementation"""
+    """Time-to-live cache implementation
+    
+    Entries are spread over independently locked shards so concurrent tool
+    calls only contend when their keys land in the same shard. Each shard
+    evicts its own least recently used entries once it holds its share of
+    ``max_size``.
     
-    def __init__(self, max_size: int = 1000, default_ttl: int = 300):
+    Hits return the stored object itself, so callers must treat cached
+    values as read-only.
+    """
+    
+    def __init__(
+        self,
+        max_size: int = 1000,
+        default_ttl: int = 300,
+        num_shards: int = 16
+    ):
         self.max_size = max_size
         self.default_ttl = default_ttl
-        self._cache = {}
-        self._access_times = {}
-        self._lock = threading.RLock()
+        self._shard_max_size = max(1, -(-max_size // num_shards))
+        # Each shard is kept in least- to most-recently used order for O(1) LRU eviction
+        self._shards: List[Tuple["OrderedDict[Hashable, Tuple[Any, int]]", threading.RLock]] = [
+            (OrderedDict(), threading.RLock()) for _ in range(num_shards)
+        ]
+        # Unlocked counters; they may undercount slightly under concurrency
+        self._hits = 0
+        self._misses = 0
+    
+    def _get_shard(self, key_hash: int) -> Tuple["OrderedDict[Hashable, Tuple[Any, int]]", threading.RLock]:
+        """Get the shard (entries, lock) responsible for a key hash"""
+        return self._shards[key_hash % len(self._shards)]
     
-    def _generate_key(self, *args, **kwargs) -> str:
-        """Generate cache key from function arguments"""
+    def _generate_key(self, *args, **kwargs) -> Hashable:
+        """Generate cache key from function arguments
+        
+        Hashable arguments are used directly as a tuple key, which skips
+        serialization entirely; the dict still compares keys for equality,
+        so hash collisions cannot return another call's result. Unhashable
+        arguments (dicts, lists) fall back to a hashed JSON string.
+        """
+        key = (args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+            return key
+        except TypeError:
+            pass
+        
         key_data = {
             'args': args,
             'kwargs': sorted(kwargs.items())
         }
         key_string = json.dumps(key_data, sort_keys=True, default=str)
-        return hashlib.md5(key_string.encode()).hexdigest()
+        return _hash_key_string(key_string)
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get item from cache if not expired"""
-        with self._lock:
-            if key not in self._cache:
-                return None
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get item from cache if not expired, otherwise ``default``"""
+        entries, lock = self._get_shard(hash(key))
+        with lock:
+            if key not in entries:
+                self._misses += 1
+                return default
             
-            item, expiry_time = self._cache[key]
+            item, expiry_ns = entries[key]
             
-            if datetime.utcnow() > expiry_time:
+            if time.monotonic_ns() > expiry_ns:
                 # Item expired, remove it
-                del self._cache[key]
-                if key in self._access_times:
-                    del self._access_times[key]
-                return None
+                del entries[key]
+                self._misses += 1
+                return default
             
-            # Update access time
-            self._access_times[key] = datetime.utcnow()
-            return item
+            # Mark as most recently used
+            entries.move_to_end(key)
+            self._hits += 1
+        
+        return item
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None) -> None:
         """Set item in cache with TTL"""
-        with self._lock:
-            # Use default TTL if not specified
-            if ttl is None:
-                ttl = self.default_ttl
-            
-            expiry_time = datetime.utcnow() + timedelta(seconds=ttl)
-            
-            # Check if we need to evict items
-            if len(self._cache) >= self.max_size:
-                self._evict_oldest()
-            
-            self._cache[key] = (value, expiry_time)
-            self._access_times[key] = datetime.utcnow()
-    
-    def _evict_oldest(self) -> None:
-        """Evict oldest accessed item"""
-        if not self._access_times:
-            return
+        # Use default TTL if not specified
+        if ttl is None:
+            ttl = self.default_ttl
+        
+        # Monotonic integer expiry avoids datetime allocations on every lookup
+        expiry_ns = time.monotonic_ns() + ttl * 1_000_000_000
         
-        oldest_key = min(self._access_times.keys(), key=lambda k: self._access_times[k])
-        del self._cache[oldest_key]
-        del self._access_times[oldest_key]
+        entries, lock = self._get_shard(hash(key))
+        with lock:
+            entries[key] = (value, expiry_ns)
+            entries.move_to_end(key)
+            
+            # Evict least recently used items in this shard
+            while len(entries) > self._shard_max_size:
+                entries.popitem(last=False)
     
     def clear(self) -> None:
         """Clear all cached items"""
-        with self._lock:
-            self._cache.clear()
-            self._access_times.clear()
+        for entries, lock in self._shards:
+            with lock:
+                entries.clear()
+        self._hits = 0
+        self._misses = 0
     
     def size(self) -> int:
         """Get current cache size"""
-        with self._lock:
-            return len(self._cache)
+        total = 0
+        for entries, lock in self._shards:
+            with lock:
+                total += len(entries)
+        return total
+    
+    def hit_ratio(self) -> float:
+        """Get the fraction of lookups served from cache"""
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
 
 # Global cache instance
 cache = TTLCache(max_size=1000, default_ttl=300)  # 5 minute default TTL
 
-def cached(ttl: int = 300):
-    """Decorator to cache function results with TTL"""
+def _is_negative_result(result: Any) -> bool:
+    """Check whether a result is empty (None or an empty collection)"""
+    return result is None or (isinstance(result, (list, tuple, dict, set)) and not result)
+
+def cached(
+    ttl: int = 300,
+    min_compute_ns: int = 50_000,
+    q: float = 1.0,
+    negative_ttl: int = 60
+):
+    """Decorator to cache function results with TTL
+    
+    Results computed in under ``min_compute_ns`` are not cached, since
+    recomputing them is cheaper than churning the cache. Other misses are
+    admitted with probability ``q`` (q-LRU), so one-off calls are less
+    likely to evict entries that are requested repeatedly. Empty results
+    (None, [], {}) are cached for the shorter ``negative_ttl`` so newly
+    added data shows up sooner.
+    """
     def decorator(func):
+        # Qualified name, so same-named functions in other modules or
+        # classes never share entries in the global cache
+        func_id = f"{func.__module__}.{func.__qualname__}"
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Generate cache key
-            cache_key = cache._generate_key(func.__name__, *args, **kwargs)
+            cache_key = cache._generate_key(func_id, *args, **kwargs)
             
             # Try to get from cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                logger.debug(
-                    "Cache hit",
-                    function=func.__name__,
-                    cache_key=cache_key[:16]  # First 16 chars for logging
-                )
+            cached_result = cache.get(cache_key, _MISSING)
+            if cached_result is not _MISSING:
+                # Skip building log kwargs on the hot path unless DEBUG is on
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Cache hit", function=func.__name__)
                 return cached_result
             
-            # Execute function and cache result
+            # Execute function and cache result if it was worth caching
+            start_ns = time.perf_counter_ns()
             result = func(*args, **kwargs)
-            cache.set(cache_key, result, ttl)
+            if time.perf_counter_ns() - start_ns < min_compute_ns:
+                return result
+            if q < 1.0 and random.random() >= q:
+                return result
+            entry_ttl = negative_ttl if _is_negative_result(result) else ttl
+            cache.set(cache_key, result, entry_ttl)
             
-            logger.debug(
-                "Cache miss, result cached",
-                function=func.__name__,
-                cache_key=cache_key[:16],
-                ttl=ttl
-            )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Cache miss, result cached",
+                    function=func.__name__,
+                    ttl=entry_ttl
+                )
             
             return result
         return wrapper
     return decorator
 
+# Query builder method for each supported filter operator
+FILTER_OPERATORS = {
+    'eq': lambda query, column, value: query.eq(column, value),
+    'gt': lambda query, column, value: query.gt(column, value),
+    'lt': lambda query, column, value: query.lt(column, value),
+    'gte': lambda query, column, value: query.gte(column, value),
+    'lte': lambda query, column, value: query.lte(column, value),
+    'like': lambda query, column, value: query.like(column, value),
+    'ilike': lambda query, column, value: query.ilike(column, value),
+}
+
 @dataclass
 class PaginationInfo:
     """Pagination metadata"""
@@ -133,10 +239,11 @@ class PaginationInfo:
     page_size: int
     total_count: Optional[int] = None
     has_more: bool = False
-    offset: int = 0
     
-    def __post_init__(self):
-        self.offset = (self.page - 1) * self.page_size
+    @property
+    def offset(self) -> int:
+        """Calculate offset for database queries"""
+        return (self.page - 1) * self.page_size
 
 def paginate_supabase_query(
     table_name: str,
@@ -151,9 +258,13 @@ def paginate_supabase_query(
     Args:
         table_name: Name of the table to query
         select_columns: Columns to select
-        filters: Dictionary of column filters (eq, gt, lt, etc.)
-        order_by: Column to order by
-        pagination: Pagination parameters
+        filters: Dictionary of column filters (eq, gt, lt, etc.); unknown
+            operators raise ValueError
+        order_by: Column to order by (ignored for keyset pages, which are
+            ordered by pagination.cursor_key)
+        pagination: Pagination parameters; set cursor_value to the previous
+            page's next_cursor for keyset pagination. Offset pages only
+            return a next_cursor when ordered by pagination.cursor_key
         
     Returns:
         Paginated response with data and metadata
@@ -166,12 +277,13 @@ def paginate_supabase_query(
         table=table_name,
         page=pagination.page,
         page_size=pagination.page_size,
+        cursor=pagination.cursor_value,
         filters=filters
     )
     
     try:
         # Build query
-        query = supabase.table(table_name).select(select_columns)
+        query = get_supabase().table(table_name).select(select_columns)
         
         # Apply filters
         if filters:
@@ -179,32 +291,31 @@ def paginate_supabase_query(
                 if isinstance(value, dict):
                     # Handle complex filters like {'gt': 10}
                     for operator, filter_value in value.items():
-                        if operator == 'eq':
-                            query = query.eq(column, filter_value)
-                        elif operator == 'gt':
-                            query = query.gt(column, filter_value)
-                        elif operator == 'lt':
-                            query = query.lt(column, filter_value)
-                        elif operator == 'gte':
-                            query = query.gte(column, filter_value)
-                        elif operator == 'lte':
-                            query = query.lte(column, filter_value)
-                        elif operator == 'like':
-                            query = query.like(column, filter_value)
-                        elif operator == 'ilike':
-                            query = query.ilike(column, filter_value)
+                        apply_filter = FILTER_OPERATORS.get(operator)
+                        if apply_filter is None:
+                            raise ValueError(f"Unsupported filter operator: {operator}")
+                        query = apply_filter(query, column, filter_value)
                 else:
                     # Simple equality filter
                     query = query.eq(column, value)
         
-        # Apply ordering
-        if order_by:
-            query = query.order(order_by)
-        
-        # Apply pagination
-        start_range = pagination.offset
-        end_range = pagination.offset + pagination.page_size - 1
-        query = query.range(start_range, end_range)
+        if pagination.cursor_value is not None:
+            # Keyset pagination: seek past the last-seen key through the index
+            # instead of making the database scan and discard offset rows
+            query = (
+                query.gt(pagination.cursor_key, pagination.cursor_value)
+                .order(pagination.cursor_key)
+                .limit(pagination.page_size)
+            )
+        else:
+            # Apply ordering
+            if order_by:
+                query = query.order(order_by)
+            
+            # Apply offset pagination
+            start_range = pagination.offset
+            end_range = pagination.offset + pagination.page_size - 1
+            query = query.range(start_range, end_range)
         
         # Execute query
         result = query.execute()
@@ -213,6 +324,16 @@ def paginate_supabase_query(
         data_count = len(result.data)
         has_more = data_count == pagination.page_size
         
+        # Cursor for fetching the next page with keyset pagination; only
+        # valid when this page was ordered by the cursor key, otherwise a
+        # keyset follow-up would skip or repeat rows
+        next_cursor = None
+        ordered_by_cursor = (
+            pagination.cursor_value is not None or order_by == pagination.cursor_key
+        )
+        if has_more and data_count and ordered_by_cursor:
+            next_cursor = result.data[-1].get(pagination.cursor_key)
+        
         # For total count, we'd need a separate count query
         # This is expensive, so we'll estimate based on the current page
         total_count = None
@@ -226,7 +347,8 @@ def paginate_supabase_query(
                 "page_size": pagination.page_size,
                 "total_count": total_count,
                 "has_more": has_more,
-                "returned_count": data_count
+                "returned_count": data_count,
+                "next_cursor": next_cursor
             }
         }
         
@@ -248,9 +370,74 @@ def paginate_supabase_query(
         )
         raise
 
+# Rows fetched per round-trip when streaming (the PaginationRequest maximum)
+STREAM_CHUNK_SIZE = 500
+
+def paginate_supabase_query_stream(
+    table_name: str,
+    select_columns: str = "*",
+    filters: Optional[Dict[str, Any]] = None,
+    cursor_key: str = "unique_id",
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every matching row in fixed-size keyset chunks
+    
+    Only one chunk is held in memory at a time, and each chunk seeks past
+    the last-seen cursor_key instead of using a deep offset.
+    
+    Args:
+        table_name: Name of the table to query
+        select_columns: Columns to select; must include cursor_key
+        filters: Dictionary of column filters (eq, gt, lt, etc.)
+        cursor_key: Unique, indexed column the rows are ordered by
+        chunk_size: Rows fetched per query
+        
+    Yields:
+        Rows in cursor_key order
+    """
+    pagination = PaginationRequest(page_size=chunk_size, cursor_key=cursor_key)
+    
+    while True:
+        result = paginate_supabase_query(
+            table_name,
+            select_columns,
+            filters=filters,
+            order_by=cursor_key,
+            pagination=pagination
+        )
+        yield from result["data"]
+        
+        next_cursor = result["pagination"]["next_cursor"]
+        if not result["pagination"]["has_more"]:
+            return
+        if next_cursor is None:
+            raise ValueError(f"Streamed rows must include cursor column '{cursor_key}'")
+        pagination = pagination.model_copy(update={"cursor_value": next_cursor})
+
+# How long table counts are reused before being fetched again
+COUNT_TTL_SECONDS = 600
+
+@lru_cache(maxsize=1024)
+def _get_count(table: str, filter_str: str, mode: str, ttl_bucket: int) -> int:
+    """Fetch a table count; ttl_bucket expires cached counts when it rolls over"""
+    # Assessment tables are keyed by unique_id; none has an id column.
+    # head=True sends a HEAD request, so only the count comes back, no rows
+    query = get_supabase().table(table).select("unique_id", count=mode, head=True)
+    
+    # Apply filters (simplified for count query)
+    if filter_str:
+        for column, value in json.loads(filter_str).items():
+            if not isinstance(value, dict):
+                query = query.eq(column, value)
+    
+    result = query.execute()
+    return result.count or 0
+
 def get_total_count(
     table_name: str,
-    filters: Optional[Dict[str, Any]] = None
+    filters: Optional[Dict[str, Any]] = None,
+    count_mode: Literal["exact", "planned", "estimated"] = "estimated"
 ) -> int:
     """
     Get total count for a table with filters (cached)
@@ -258,38 +445,34 @@ def get_total_count(
     Args:
         table_name: Name of the table
         filters: Dictionary of column filters
+        count_mode: PostgREST count method. "estimated" uses the planner
+            estimate for large results instead of scanning the table; pass
+            "exact" when the count must be precise
         
     Returns:
         Total count of matching records
     """
-    @cached(ttl=600)  # Cache count for 10 minutes
-    def _get_count(table: str, filter_str: str) -> int:
-        query = supabase.table(table).select("id", count="exact")
-        
-        # Apply filters (simplified for count query)
-        if filters:
-            for column, value in filters.items():
-                if not isinstance(value, dict):
-                    query = query.eq(column, value)
-        
-        result = query.execute()
-        return result.count or 0
-    
     # Convert filters to string for caching
     filter_str = json.dumps(filters, sort_keys=True) if filters else ""
     
-    return _get_count(table_name, filter_str)
+    # Counts are cached for up to COUNT_TTL_SECONDS (10 minutes)
+    ttl_bucket = time.monotonic_ns() // (COUNT_TTL_SECONDS * 1_000_000_000)
+    return _get_count(table_name, filter_str, count_mode, ttl_bucket)
 
 def paginate_list(
-    data_list: List[Any],
-    pagination: Optional[PaginationRequest] = None
+    data_list: Sequence[Any],
+    pagination: Optional[PaginationRequest] = None,
+    copy: bool = True
 ) -> Dict[str, Any]:
     """
     Paginate a list of data in memory
     
     Args:
-        data_list: List of data to paginate
+        data_list: List, DataFrame or NumPy array of data to paginate
         pagination: Pagination parameters
+        copy: Return the page as a new slice. When False, DataFrames and
+            arrays return a view of the page and lists return a lazy
+            islice iterator, which is only valid for a single pass
         
     Returns:
         Paginated response with data and metadata
@@ -301,7 +484,14 @@ def paginate_list(
     start_idx = pagination.offset
     end_idx = start_idx + pagination.page_size
     
-    paginated_data = data_list[start_idx:end_idx]
+    if copy:
+        paginated_data = data_list[start_idx:end_idx]
+    elif isinstance(data_list, pd.DataFrame):
+        paginated_data = data_list.iloc[start_idx:end_idx]
+    elif isinstance(data_list, np.ndarray):
+        paginated_data = data_list[start_idx:end_idx]
+    else:
+        paginated_data = islice(data_list, start_idx, end_idx)
     has_more = end_idx < total_count
     
     return {
@@ -311,33 +501,53 @@ def paginate_list(
             "page_size": pagination.page_size,
             "total_count": total_count,
             "has_more": has_more,
-            "returned_count": len(paginated_data)
+            "returned_count": max(0, min(end_idx, total_count) - start_idx)
         }
     }
 
 # Cache warming functions
-def warm_cache_for_common_queries():
-    """Pre-populate cache with common query results"""
+WARM_ASSESSMENT_TYPES = ("ptsd", "phq", "gad", "who", "ders")
+
+async def warm_cache_for_common_queries():
+    """Pre-populate cache with common query results
+    
+    The blocking Supabase calls run concurrently in the default executor,
+    so warming takes about as long as the slowest query.
+    """
     logger.info("Warming cache with common queries")
     
-    try:
-        # Cache patient list
-        common_pagination = PaginationRequest(page=1, page_size=50)
-        paginate_supabase_query("PTSD", "group_identifier", pagination=common_pagination)
-        
-        # Cache assessment summary stats
-        for assessment_type in ["ptsd", "phq", "gad", "who", "ders"]:
-            # This would cache summary statistics
-            pass
-        
-        logger.info("Cache warming completed")
-        
-    except Exception as e:
-        logger.error("Cache warming failed", error=str(e))
+    loop = asyncio.get_running_loop()
+    table_names = [HEALTHCARE_TABLES[assessment_type] for assessment_type in WARM_ASSESSMENT_TYPES]
+    tasks = [
+        loop.run_in_executor(None, get_total_count, table_name)
+        for table_name in table_names
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    failed_tables = [
+        table_name for table_name, result in zip(table_names, results)
+        if isinstance(result, Exception)
+    ]
+    if failed_tables:
+        logger.error("Cache warming failed", tables=failed_tables)
+    else:
+        logger.info("Cache warming completed", tables=table_names)
+
+def start_cache_warming() -> threading.Thread:
+    """Warm the cache in a background thread without delaying startup"""
+    thread = threading.Thread(
+        target=asyncio.run,
+        args=(warm_cache_for_common_queries(),),
+        name="cache-warming",
+        daemon=True
+    )
+    thread.start()
+    return thread
 
 def clear_cache():
     """Clear all cached data"""
     cache.clear()
+    _get_count.cache_clear()
     logger.info("Cache cleared")
 
 # Cache statistics
@@ -347,5 +557,8 @@ def get_cache_stats() -> Dict[str, Any]:
         "cache_size": cache.size(),
         "max_cache_size": cache.max_size,
         "default_ttl_seconds": cache.default_ttl,
-        "cache_utilization_percent": (cache.size() / cache.max_size) * 100
+        "cache_utilization_percent": (cache.size() / cache.max_size) * 100,
+        "hits": cache._hits,
+        "misses": cache._misses,
+        "hit_ratio": cache.hit_ratio()
     }
\ No newline at end of file
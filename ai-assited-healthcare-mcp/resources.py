@@ -2,26 +2,436 @@
 Dynamic resources for Healthcare MCP Server
 """
 
-from typing import List, Dict, Any, Optional
+import asyncio
+import math
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import json
 from fastmcp import FastMCP
-from config import supabase, HEALTHCARE_TABLES
+from config import (
+    get_supabase,
+    mcp_config,
+    HEALTHCARE_TABLES,
+    LATEST_ASSESSMENT_VIEWS,
+    ALL_PATIENT_IDS_VIEW,
+)
+from logging_config import get_logger
+from pagination_caching import cached, paginate_supabase_query_stream
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional, faster JSON encoder
+    orjson = None
+
+logger = get_logger("resources")
+
+# Seconds Supabase reads are reused across resource requests
+RESOURCE_CACHE_TTL = 60
+
+# Assessments per type in a patient profile requested without full history
+PROFILE_RECENT_LIMIT = 5
+
+# Lookback per trends timeframe; None reads every assessment
+TIMEFRAME_DELTAS = {
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+    "180d": timedelta(days=180),
+    "1y": timedelta(days=365),
+    "all": None,
+}
+
+# Question columns summed into each assessment total (healthcare-dashboard
+# supabase-schema.sql); high-risk screening selects only these
+PTSD_SCORE_COLUMNS = (
+    "ptsd_q1_disturbing_memories",
+    "ptsd_q2_disturbing_dreams",
+    "ptsd_q3_reliving_experience",
+    "ptsd_q4_upset_reminders",
+    "ptsd_q5_physical_reactions",
+    "ptsd_q6_avoiding_memories",
+    "ptsd_q7_avoiding_reminders",
+    "ptsd_q8_memory_trouble",
+    "ptsd_q9_negative_beliefs",
+    "ptsd_q10_blaming_self_others",
+    "ptsd_q11_negative_feelings",
+    "ptsd_q12_loss_interest",
+    "ptsd_q13_feeling_distant",
+    "ptsd_q14_trouble_positive_feelings",
+    "ptsd_q15_irritable_behavior",
+    "ptsd_q16_risky_behavior",
+    "ptsd_q17_hypervigilant",
+    "ptsd_q18_easily_startled",
+    "ptsd_q19_concentration_difficulty",
+    "ptsd_q20_sleep_trouble",
+)
+# col_10 is the difficulty rating, not a scored PHQ-9 item
+PHQ_SCORE_COLUMNS = (
+    "col_1_little_interest_or_pleasure_in_doing_things",
+    "col_2_feeling_down_depressed_or_hopeless",
+    "col_3_trouble_falling_or_staying_asleep_or_sleeping_too_much",
+    "col_4_feeling_tired_or_having_little_energy",
+    "col_5_poor_appetite_or_overeating",
+    "col_6_feeling_bad_about_yourself_or_that_you_are_failure_or_hav",
+    "col_7_trouble_concentrating_on_things_such_as_reading_the_newsp",
+    "col_8_moving_or_speaking_so_slowly_that_other_people_could_have",
+    "col_9_thoughts_that_you_would_be_better_off_dead_or_of_hurting_",
+)
+# GAD-7 question 5 was imported under two column names
+GAD_SCORE_COLUMNS = (
+    "col_1_feeling_nervous_anxious_or_on_edge",
+    "col_2_not_being_able_to_stop_or_control_worrying",
+    "col_3_worrying_too_much_about_different_things",
+    "col_4_trouble_relaxing",
+    "col_5_being_so_restless_that_it_is_too_hard_to_sit_still",
+    "col_5_being_so_restless_that_its_hard_to_sit_still",
+    "col_6_becoming_easily_annoyed_or_irritable",
+    "col_7_feeling_afraid_as_if_something_awful_might_happen",
+)
+SCORE_COLUMNS = {
+    "ptsd": PTSD_SCORE_COLUMNS,
+    "phq": PHQ_SCORE_COLUMNS,
+    "gad": GAD_SCORE_COLUMNS,
+}
+# Stored sums of SCORE_COLUMNS (database-views.sql)
+TOTAL_COLUMNS = {
+    "ptsd": "ptsd_total",
+    "phq": "phq_total",
+    "gad": "gad_total",
+}
+
+# Substances flagged as high-risk when a patient is actively using them
+HIGH_RISK_SUBSTANCES = frozenset(
+    {"Heroin", "Cocaine (Powder)", "Crack Cocaine", "Crystal Meth"}
+)
+
+
+def dumps_json(obj: Any) -> str:
+    """Serialize a resource or tool response, with orjson when it is installed
+
+    Output is compact unless MCP_JSON_INDENT is on, which indents by two
+    spaces. Datetimes and numpy values are encoded natively; anything else
+    falls back to str().
+    """
+    pretty = mcp_config.pretty_json
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=str, option=option).decode()
+    return json.dumps(obj, indent=2 if pretty else None, default=str)
+
+
+def _latest_by_patient(
+    rows: Iterable[Dict[str, Any]]
+) -> Dict[str, Dict[str, Any]]:
+    """Newest row per group_identifier, newest patients first
+
+    Rows may arrive in any order; on equal dates the first row seen wins.
+    """
+    latest = {}
+    for record in rows:
+        patient_id = record.get("group_identifier")
+        if not patient_id:
+            continue
+        current = latest.get(patient_id)
+        if current is None or (record.get("assessment_date") or "") > (
+            current.get("assessment_date") or ""
+        ):
+            latest[patient_id] = record
+    return dict(
+        sorted(
+            latest.items(),
+            key=lambda item: item[1].get("assessment_date") or "",
+            reverse=True,
+        )
+    )
+
+
+class _ColumnStats:
+    """Running statistics of one numeric column
+
+    Mean and variance are updated with Welford's algorithm; values are kept
+    in a compact float array so quantiles need one numpy pass at the end.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max", "values")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.values = array("d")
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.values.append(value)
+
+    def summary(self) -> Dict[str, Any]:
+        import numpy as np
+
+        p25, median, p75, p90, p95 = np.quantile(
+            np.frombuffer(self.values, dtype=float), [0.25, 0.5, 0.75, 0.9, 0.95]
+        )
+        # Sample standard deviation, undefined for a single value
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 2),
+            "median": round(float(median), 2),
+            "std": round(std, 2),
+            "min": float(self.min),
+            "max": float(self.max),
+            "percentiles": {
+                "25th": round(float(p25), 2),
+                "75th": round(float(p75), 2),
+                "90th": round(float(p90), 2),
+                "95th": round(float(p95), 2),
+            },
+        }
+
+
+def _severe_totals(
+    latest: Dict[str, Dict[str, Any]], columns: Tuple[str, ...], threshold: float
+) -> Dict[str, float]:
+    """Patients whose latest total score reaches threshold, with their totals
+
+    Totals and the threshold test run vectorized over all patients at once;
+    missing or non-numeric answers count as 0.
+    """
+    import pandas as pd
+
+    if not latest:
+        return {}
+    df = pd.DataFrame.from_dict(latest, orient="index").reindex(columns=list(columns))
+    scores = df.apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy()
+    totals = pd.Series(scores.sum(axis=1), index=df.index)
+    return totals[totals >= threshold].to_dict()
+
+
+@cached(ttl=RESOURCE_CACHE_TTL)
+def _select_rows(
+    table_name: str,
+    columns: str = "*",
+    patient_id: Optional[str] = None,
+    newest_first: bool = False,
+    active_only: bool = False,
+) -> List[Dict[str, Any]]:
+    """Rows of a table, optionally for one patient, in use, and newest first"""
+    query = get_supabase().table(table_name).select(columns)
+    if patient_id is not None:
+        query = query.eq("group_identifier", patient_id)
+    if active_only:
+        query = query.eq("use_flag", 1)
+    if newest_first:
+        query = query.order("assessment_date", desc=True)
+    return query.execute().data or []
+
+
+def _stream_rows(
+    table_name: str,
+    columns: str = "*",
+    filters: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Every matching row of an assessment table or view, in unique_id keyset pages
+
+    Unlike a bare select, this is not cut off at the API's row limit.
+    """
+    if columns != "*" and "unique_id" not in columns.split(","):
+        columns = f"unique_id,{columns}"
+    return paginate_supabase_query_stream(table_name, columns, filters=filters)
+
+
+@cached(ttl=RESOURCE_CACHE_TTL)
+def _select_all(table_name: str) -> List[Dict[str, Any]]:
+    """Every row of an assessment table"""
+    return list(_stream_rows(table_name))
+
+
+def _stream_population_summary(table_name: str) -> Dict[str, Any]:
+    """Row, patient and per-numeric-column statistics of a streamed table
+
+    Columns holding any non-numeric value are left out, as are unique_id
+    and missing values.
+    """
+    total_records = 0
+    patients = set()
+    columns: Dict[str, _ColumnStats] = {}
+    non_numeric = {"unique_id"}
+
+    for row in _stream_rows(table_name):
+        total_records += 1
+        patients.add(row.get("group_identifier"))
+        for column, value in row.items():
+            if value is None or column in non_numeric:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                non_numeric.add(column)
+                columns.pop(column, None)
+            elif not math.isnan(value):
+                columns.setdefault(column, _ColumnStats()).add(value)
+
+    patients.discard(None)
+    return {
+        "total_records": total_records,
+        "unique_patients": len(patients),
+        "statistics": {
+            column: column_stats.summary()
+            for column, column_stats in columns.items()
+        },
+    }
+
+
+@cached(ttl=RESOURCE_CACHE_TTL)
+def _population_summary(table_name: str) -> Dict[str, Any]:
+    """Row, patient and per-numeric-column statistics of an assessment table
+
+    Computed in Postgres by the assessment_stats function, falling back to
+    streaming the table when the function has not been created.
+    """
+    try:
+        summary = (
+            get_supabase()
+            .rpc("assessment_stats", {"assessment_table": table_name})
+            .execute()
+            .data
+        )
+        if summary:
+            return summary
+    except Exception as e:
+        logger.warning(
+            "Statistics function unavailable, streaming table",
+            table=table_name,
+            error=str(e),
+        )
+    return _stream_population_summary(table_name)
+
+
+@cached(ttl=RESOURCE_CACHE_TTL)
+def _select_recent(
+    table_name: str, patient_id: str, limit: int
+) -> Tuple[List[Dict[str, Any]], int]:
+    """A patient's newest rows plus their total row count from one query"""
+    result = (
+        get_supabase().table(table_name)
+        .select("*", count="exact")
+        .eq("group_identifier", patient_id)
+        .order("assessment_date", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    rows = result.data or []
+    return rows, result.count if result.count is not None else len(rows)
+
+
+def _patient_assessments(
+    table_name: str, patient_id: str, include_history: bool
+) -> Tuple[List[Dict[str, Any]], int]:
+    """A patient's rows newest first and their total count
+
+    Without history only the PROFILE_RECENT_LIMIT newest rows are
+    downloaded; the total comes from the database's exact count.
+    """
+    if include_history:
+        rows = _select_rows(table_name, patient_id=patient_id, newest_first=True)
+        return rows, len(rows)
+    return _select_recent(table_name, patient_id, PROFILE_RECENT_LIMIT)
+
+
+@cached(ttl=RESOURCE_CACHE_TTL)
+def _fetch_latest(
+    assessment_type: str, columns: str = "*"
+) -> Dict[str, Dict[str, Any]]:
+    """Latest assessment row per patient, newest patients first
+
+    Reads the precomputed materialized view, falling back to scanning the
+    full assessment table when the view has not been created.
+    """
+    try:
+        rows = list(_stream_rows(LATEST_ASSESSMENT_VIEWS[assessment_type], columns))
+    except Exception as e:
+        logger.warning(
+            "Latest assessment view unavailable, scanning table",
+            assessment_type=assessment_type,
+            error=str(e),
+        )
+        rows = _stream_rows(HEALTHCARE_TABLES[assessment_type], columns)
+    return _latest_by_patient(rows)
+
+
+@cached(ttl=RESOURCE_CACHE_TTL)
+def _all_patient_ids() -> List[str]:
+    """Every patient with a PTSD, PHQ or GAD assessment
+
+    Postgres deduplicates through the all_patient_ids view; without the
+    view each table's identifiers are streamed and deduplicated here.
+    """
+    try:
+        return [
+            row["group_identifier"]
+            for row in paginate_supabase_query_stream(
+                ALL_PATIENT_IDS_VIEW, "group_identifier", cursor_key="group_identifier"
+            )
+        ]
+    except Exception as e:
+        logger.warning("Patient ID view unavailable, scanning tables", error=str(e))
+    patients = set()
+    for assessment_type in SCORE_COLUMNS:
+        patients.update(
+            row["group_identifier"]
+            for row in _stream_rows(
+                HEALTHCARE_TABLES[assessment_type], "group_identifier"
+            )
+            if row.get("group_identifier")
+        )
+    return sorted(patients)
+
+
+@cached(ttl=RESOURCE_CACHE_TTL)
+def _severe_latest(assessment_type: str, threshold: float) -> Dict[str, float]:
+    """Patients whose latest total score reaches threshold, with their totals
+
+    Only severe rows are read, filtered on the latest view's stored total
+    column; without that column the question columns are summed instead.
+    """
+    total_column = TOTAL_COLUMNS[assessment_type]
+    try:
+        return {
+            row["group_identifier"]: float(row[total_column])
+            for row in _stream_rows(
+                LATEST_ASSESSMENT_VIEWS[assessment_type],
+                f"group_identifier,{total_column}",
+                filters={total_column: {"gte": threshold}},
+            )
+        }
+    except Exception as e:
+        logger.warning(
+            "Stored totals unavailable, summing question columns",
+            assessment_type=assessment_type,
+            error=str(e),
+        )
+    columns = SCORE_COLUMNS[assessment_type]
+    latest = _fetch_latest(
+        assessment_type, ",".join(("group_identifier", "assessment_date") + columns)
+    )
+    return _severe_totals(latest, columns, threshold)
 
 
 def create_patient_resources(mcp: FastMCP):
     """Create all patient data resources"""
 
-    @mcp.resource("patient://{patient_id}/complete-profile")
-    def patient_complete_profile(patient_id: str) -> str:
-        """
-        Complete patient profile across all assessments and substance use
-
-        Args:
-            patient_id: Patient group identifier
-
-        Returns:
-            JSON string of complete patient profile
-        """
+    async def build_patient_profile(patient_id: str, include_history: bool) -> str:
+        """Build the patient profile JSON, with or without every assessment row"""
+        history_key = "all" if include_history else "recent"
+        assessment_keys = ["ptsd", "phq", "gad", "who", "ders", "ders2"]
         try:
             profile = {
                 "patient_id": patient_id,
@@ -30,61 +440,59 @@ def create_patient_resources(mcp: FastMCP):
                 "summary": {},
             }
 
+            # Query every table concurrently; each sync client call runs in
+            # a worker thread, so latency is the slowest query, not the sum
+            *assessment_results, substance_rows = await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        _patient_assessments,
+                        HEALTHCARE_TABLES[key],
+                        patient_id,
+                        include_history,
+                    )
+                    for key in assessment_keys
+                ),
+                asyncio.to_thread(
+                    _select_rows,
+                    HEALTHCARE_TABLES["substance_history"],
+                    patient_id=patient_id,
+                ),
+            )
+            fetched = dict(zip(assessment_keys, assessment_results))
+
             # Get all assessment types
             for assessment_type in ["ptsd", "phq", "gad", "who"]:
-                table_name = HEALTHCARE_TABLES[assessment_type]
-                result = (
-                    supabase.table(table_name)
-                    .select("*")
-                    .eq("group_identifier", patient_id)
-                    .order("assessment_date", desc=True)
-                    .execute()
-                )
+                rows, count = fetched[assessment_type]
 
                 profile["assessments"][assessment_type] = {
-                    "count": len(result.data),
-                    "latest": result.data[0] if result.data else None,
-                    "all": result.data,
+                    "count": count,
+                    "latest": rows[0] if rows else None,
+                    history_key: rows,
                 }
 
             # Get DERS assessments
-            ders1_result = (
-                supabase.table(HEALTHCARE_TABLES["ders"])
-                .select("*")
-                .eq("group_identifier", patient_id)
-                .execute()
-            )
-            ders2_result = (
-                supabase.table(HEALTHCARE_TABLES["ders2"])
-                .select("*")
-                .eq("group_identifier", patient_id)
-                .execute()
-            )
+            ders1_rows, ders1_count = fetched["ders"]
+            ders2_rows, ders2_count = fetched["ders2"]
 
             profile["assessments"]["ders"] = {
-                "ders1_count": len(ders1_result.data),
-                "ders2_count": len(ders2_result.data),
-                "ders1_data": ders1_result.data,
-                "ders2_data": ders2_result.data,
+                "ders1_count": ders1_count,
+                "ders2_count": ders2_count,
+                "ders1_data": ders1_rows,
+                "ders2_data": ders2_rows,
             }
 
             # Get substance use data
-            substance_result = (
-                supabase.table(HEALTHCARE_TABLES["substance_history"])
-                .select("*")
-                .eq("group_identifier", patient_id)
-                .execute()
-            )
-
-            if substance_result.data:
+            active_count = 0
+            if substance_rows:
                 active_substances = [
-                    s for s in substance_result.data if s.get("use_flag") == 1
+                    s for s in substance_rows if s.get("use_flag") == 1
                 ]
+                active_count = len(active_substances)
                 profile["substance_use"] = {
-                    "total_tracked": len(substance_result.data),
-                    "active_count": len(active_substances),
+                    "total_tracked": len(substance_rows),
+                    "active_count": active_count,
                     "active_substances": active_substances,
-                    "all_substances": substance_result.data,
+                    "all_substances": substance_rows,
                 }
 
             # Generate summary
@@ -99,17 +507,46 @@ def create_patient_resources(mcp: FastMCP):
 
             profile["summary"] = {
                 "total_assessments": total_assessments,
-                "has_substance_data": len(substance_result.data) > 0,
-                "active_substance_count": len(active_substances) if substance_result.data else 0,  # type: ignore
+                "has_substance_data": len(substance_rows) > 0,
+                "active_substance_count": active_count,
             }
 
-            return json.dumps(profile, indent=2, default=str)
+            return dumps_json(profile)
 
         except Exception as e:
-            return json.dumps(
+            return dumps_json(
                 {"error": f"Failed to retrieve patient profile: {str(e)}"}
             )
 
+    @mcp.resource("patient://{patient_id}/complete-profile")
+    async def patient_complete_profile(patient_id: str) -> str:
+        """
+        Complete patient profile across all assessments and substance use
+
+        Each assessment type includes its total count, the latest result and
+        the most recent results; use the history resource for every row.
+
+        Args:
+            patient_id: Patient group identifier
+
+        Returns:
+            JSON string of complete patient profile
+        """
+        return await build_patient_profile(patient_id, include_history=False)
+
+    @mcp.resource("patient://{patient_id}/complete-profile/history")
+    async def patient_complete_history(patient_id: str) -> str:
+        """
+        Complete patient profile including every assessment row
+
+        Args:
+            patient_id: Patient group identifier
+
+        Returns:
+            JSON string of complete patient profile with full history
+        """
+        return await build_patient_profile(patient_id, include_history=True)
+
     @mcp.resource("assessment://{assessment_type}/latest-scores")
     def latest_assessment_scores(assessment_type: str) -> str:
         """
@@ -123,54 +560,30 @@ def create_patient_resources(mcp: FastMCP):
         """
         try:
             if assessment_type not in ["ptsd", "phq", "gad", "who", "ders"]:
-                return json.dumps({"error": "Invalid assessment type"})
+                return dumps_json({"error": "Invalid assessment type"})
 
             if assessment_type == "ders":
                 # Handle DERS separately
-                ders1_result = (
-                    supabase.table(HEALTHCARE_TABLES["ders"]).select("*").execute()
-                )
-                ders2_result = (
-                    supabase.table(HEALTHCARE_TABLES["ders2"]).select("*").execute()
-                )
-
-                return json.dumps(
+                return dumps_json(
                     {
                         "assessment_type": "ders",
-                        "ders1_data": ders1_result.data,
-                        "ders2_data": ders2_result.data,
-                    },
-                    indent=2,
-                    default=str,
+                        "ders1_data": _select_all(HEALTHCARE_TABLES["ders"]),
+                        "ders2_data": _select_all(HEALTHCARE_TABLES["ders2"]),
+                    }
                 )
 
-            table_name = HEALTHCARE_TABLES[assessment_type]
-            result = (
-                supabase.table(table_name)
-                .select("*")
-                .order("assessment_date", desc=True)
-                .execute()
-            )
+            patients_latest = _fetch_latest(assessment_type)
 
-            # Group by patient and get latest for each
-            patients_latest = {}
-            for record in result.data:
-                patient_id = record.get("group_identifier")
-                if patient_id and patient_id not in patients_latest:
-                    patients_latest[patient_id] = record
-
-            return json.dumps(
+            return dumps_json(
                 {
                     "assessment_type": assessment_type,
                     "total_patients": len(patients_latest),
                     "latest_scores": list(patients_latest.values()),
-                },
-                indent=2,
-                default=str,
+                }
             )
 
         except Exception as e:
-            return json.dumps(
+            return dumps_json(
                 {
                     "error": f"Failed to retrieve latest {assessment_type} scores: {str(e)}"
                 }
@@ -190,24 +603,17 @@ def create_patient_resources(mcp: FastMCP):
         """
         try:
             import pandas as pd
-            from datetime import datetime, timedelta
 
             # Calculate date cutoff
-            now = datetime.now()
-            if timeframe == "30d":
-                cutoff_date = now - timedelta(days=30)
-            elif timeframe == "90d":
-                cutoff_date = now - timedelta(days=90)
-            elif timeframe == "180d":
-                cutoff_date = now - timedelta(days=180)
-            elif timeframe == "1y":
-                cutoff_date = now - timedelta(days=365)
-            elif timeframe == "all":
-                cutoff_date = datetime(1900, 1, 1)  # Very old date to include all
-            else:
-                return json.dumps(
+            if timeframe not in TIMEFRAME_DELTAS:
+                return dumps_json(
                     {"error": "Invalid timeframe. Use: 30d, 90d, 180d, 1y, all"}
                 )
+            delta = TIMEFRAME_DELTAS[timeframe]
+            if delta is None:
+                cutoff_date = datetime(1900, 1, 1)  # Very old date to include all
+            else:
+                cutoff_date = datetime.now() - delta
 
             trends = {
                 "patient_id": patient_id,
@@ -218,23 +624,25 @@ def create_patient_resources(mcp: FastMCP):
 
             for assessment_type in ["ptsd", "phq", "gad", "who"]:
                 table_name = HEALTHCARE_TABLES[assessment_type]
-                result = (
-                    supabase.table(table_name)
+                # Filter by timeframe in the database, so only in-range rows
+                # are transferred and parsed
+                query = (
+                    get_supabase().table(table_name)
                     .select("*")
                     .eq("group_identifier", patient_id)
-                    .execute()
                 )
+                if delta is not None:
+                    query = query.gte("assessment_date", cutoff_date.isoformat())
+                result = query.execute()
 
                 if not result.data:
                     continue
 
-                df = pd.DataFrame(result.data)
-                df["assessment_date"] = pd.to_datetime(
-                    df["assessment_date"], errors="coerce"
+                df_filtered = pd.DataFrame(result.data)
+                df_filtered["assessment_date"] = pd.to_datetime(
+                    df_filtered["assessment_date"], errors="coerce"
                 )
-
-                # Filter by timeframe
-                df_filtered = df[df["assessment_date"] >= cutoff_date]
+                df_filtered = df_filtered.dropna(subset=["assessment_date"])
 
                 if len(df_filtered) == 0:
                     continue
@@ -255,35 +663,43 @@ def create_patient_resources(mcp: FastMCP):
                     "trends": {},
                 }
 
-                # Calculate score trends
-                for col in numeric_cols:
-                    if not df_filtered[col].isna().all():
-                        values = df_filtered[col].dropna()
-                        if len(values) >= 2:
-                            assessment_trend["trends"][col] = {
-                                "first_value": float(values.iloc[0]),
-                                "last_value": float(values.iloc[-1]),
-                                "mean": round(float(values.mean()), 2),
-                                "std": round(float(values.std()), 2),
-                                "min": float(values.min()),
-                                "max": float(values.max()),
-                                "trend_direction": (
-                                    "improving"
-                                    if values.iloc[-1] < values.iloc[0]
-                                    else (
-                                        "worsening"
-                                        if values.iloc[-1] > values.iloc[0]
-                                        else "stable"
-                                    )
-                                ),
-                            }
+                # Calculate score trends for columns with at least two values;
+                # every reduction runs once over all columns instead of per column
+                values = df_filtered[numeric_cols]
+                counts = values.count()
+                values = values[counts[counts >= 2].index]
+                if not values.empty:
+                    summary = values.agg(["mean", "std", "min", "max"])
+                    first_values = values.bfill().iloc[0]
+                    last_values = values.ffill().iloc[-1]
+
+                    for col in values.columns:
+                        first_value = float(first_values[col])
+                        last_value = float(last_values[col])
+                        assessment_trend["trends"][col] = {
+                            "first_value": first_value,
+                            "last_value": last_value,
+                            "mean": round(float(summary.at["mean", col]), 2),
+                            "std": round(float(summary.at["std", col]), 2),
+                            "min": float(summary.at["min", col]),
+                            "max": float(summary.at["max", col]),
+                            "trend_direction": (
+                                "improving"
+                                if last_value < first_value
+                                else (
+                                    "worsening"
+                                    if last_value > first_value
+                                    else "stable"
+                                )
+                            ),
+                        }
 
                 trends["assessment_trends"][assessment_type] = assessment_trend
 
-            return json.dumps(trends, indent=2, default=str)
+            return dumps_json(trends)
 
         except Exception as e:
-            return json.dumps({"error": f"Failed to retrieve trends: {str(e)}"})
+            return dumps_json({"error": f"Failed to retrieve trends: {str(e)}"})
 
     @mcp.resource("population://{assessment_type}/statistics")
     def population_statistics(assessment_type: str) -> str:
@@ -297,52 +713,20 @@ def create_patient_resources(mcp: FastMCP):
             JSON string of population statistics
         """
         try:
-            import pandas as pd
-
             if assessment_type not in ["ptsd", "phq", "gad", "who"]:
-                return json.dumps({"error": "Invalid assessment type"})
-
-            table_name = HEALTHCARE_TABLES[assessment_type]
-            result = supabase.table(table_name).select("*").execute()
+                return dumps_json({"error": "Invalid assessment type"})
 
-            if not result.data:
-                return json.dumps({"error": f"No data found for {assessment_type}"})
+            summary = _population_summary(HEALTHCARE_TABLES[assessment_type])
 
-            df = pd.DataFrame(result.data)
+            if not summary["total_records"]:
+                return dumps_json({"error": f"No data found for {assessment_type}"})
 
-            stats = {
-                "assessment_type": assessment_type,
-                "total_records": len(df),
-                "unique_patients": df["group_identifier"].nunique(),
-                "statistics": {},
-            }
-
-            # Calculate statistics for numeric columns
-            numeric_cols = df.select_dtypes(include=["number"]).columns
-            numeric_cols = [col for col in numeric_cols if col not in ["unique_id"]]
-
-            for col in numeric_cols:
-                if not df[col].isna().all():
-                    col_data = df[col].dropna()
-                    stats["statistics"][col] = {
-                        "count": len(col_data),
-                        "mean": round(float(col_data.mean()), 2),
-                        "median": round(float(col_data.median()), 2),
-                        "std": round(float(col_data.std()), 2),
-                        "min": float(col_data.min()),
-                        "max": float(col_data.max()),
-                        "percentiles": {
-                            "25th": round(float(col_data.quantile(0.25)), 2),
-                            "75th": round(float(col_data.quantile(0.75)), 2),
-                            "90th": round(float(col_data.quantile(0.90)), 2),
-                            "95th": round(float(col_data.quantile(0.95)), 2),
-                        },
-                    }
+            stats = {"assessment_type": assessment_type, **summary}
 
-            return json.dumps(stats, indent=2, default=str)
+            return dumps_json(stats)
 
         except Exception as e:
-            return json.dumps(
+            return dumps_json(
                 {"error": f"Failed to retrieve population statistics: {str(e)}"}
             )
 
@@ -355,8 +739,6 @@ def create_patient_resources(mcp: FastMCP):
             JSON string of high-risk patient analysis
         """
         try:
-            import pandas as pd
-
             high_risk_analysis = {
                 "analysis_date": datetime.now().isoformat(),  # type: ignore
                 "high_risk_patients": [],
@@ -369,19 +751,24 @@ def create_patient_resources(mcp: FastMCP):
             }
 
             # Get all unique patients
-            all_patients = set()
-            for table in ["ptsd", "phq", "gad"]:
-                result = (
-                    supabase.table(HEALTHCARE_TABLES[table])
-                    .select("group_identifier")
-                    .execute()
-                )
-                if result.data:
-                    all_patients.update(
-                        record["group_identifier"]
-                        for record in result.data
-                        if record.get("group_identifier")
-                    )
+            all_patients = _all_patient_ids()
+
+            # Only substances in current use count towards risk
+            active_by_patient = defaultdict(list)
+            for record in _select_rows(
+                HEALTHCARE_TABLES["substance_history"],
+                "group_identifier,substance",
+                active_only=True,
+            ):
+                active_by_patient[record.get("group_identifier")].append(record)
+
+            # Patients whose latest score is over each severity threshold,
+            # keyed by table; every patient comes from these tables, so no
+            # per-patient filter is needed
+            severe = {
+                table: _severe_latest(table, threshold)
+                for table, threshold in (("ptsd", 50), ("phq", 15), ("gad", 15))
+            }
 
             # Analyze each patient
             for patient_id in all_patients:
@@ -389,84 +776,26 @@ def create_patient_resources(mcp: FastMCP):
                 risk_score = 0
 
                 # Check PTSD scores
-                ptsd_result = (
-                    supabase.table(HEALTHCARE_TABLES["ptsd"])
-                    .select("*")
-                    .eq("group_identifier", patient_id)
-                    .order("assessment_date", desc=True)
-                    .limit(1)
-                    .execute()
-                )
-                if ptsd_result.data:
-                    ptsd_data = ptsd_result.data[0]
-                    ptsd_scores = [
-                        ptsd_data.get(f"ptsd_q{i}_", 0) for i in range(1, 21)
-                    ]
-                    ptsd_total = sum(
-                        score
-                        for score in ptsd_scores
-                        if isinstance(score, (int, float))
-                    )
-                    if ptsd_total >= 50:
-                        risk_factors.append(f"Severe PTSD (score: {ptsd_total})")
-                        risk_score += 3
+                if patient_id in severe["ptsd"]:
+                    ptsd_total = severe["ptsd"][patient_id]
+                    risk_factors.append(f"Severe PTSD (score: {ptsd_total:g})")
+                    risk_score += 3
 
                 # Check PHQ-9 scores
-                phq_result = (
-                    supabase.table(HEALTHCARE_TABLES["phq"])
-                    .select("*")
-                    .eq("group_identifier", patient_id)
-                    .order("assessment_date", desc=True)
-                    .limit(1)
-                    .execute()
-                )
-                if phq_result.data:
-                    phq_data = phq_result.data[0]
-                    phq_scores = [phq_data.get(f"phq_q{i}_", 0) for i in range(1, 10)]
-                    phq_total = sum(
-                        score for score in phq_scores if isinstance(score, (int, float))
-                    )
-                    if phq_total >= 15:
-                        risk_factors.append(f"Severe depression (score: {phq_total})")
-                        risk_score += 3
+                if patient_id in severe["phq"]:
+                    phq_total = severe["phq"][patient_id]
+                    risk_factors.append(f"Severe depression (score: {phq_total:g})")
+                    risk_score += 3
 
                 # Check GAD-7 scores
-                gad_result = (
-                    supabase.table(HEALTHCARE_TABLES["gad"])
-                    .select("*")
-                    .eq("group_identifier", patient_id)
-                    .order("assessment_date", desc=True)
-                    .limit(1)
-                    .execute()
-                )
-                if gad_result.data:
-                    gad_data = gad_result.data[0]
-                    gad_scores = [gad_data.get(f"gad_q{i}_", 0) for i in range(1, 8)]
-                    gad_total = sum(
-                        score for score in gad_scores if isinstance(score, (int, float))
-                    )
-                    if gad_total >= 15:
-                        risk_factors.append(f"Severe anxiety (score: {gad_total})")
-                        risk_score += 3
+                if patient_id in severe["gad"]:
+                    gad_total = severe["gad"][patient_id]
+                    risk_factors.append(f"Severe anxiety (score: {gad_total:g})")
+                    risk_score += 3
 
                 # Check substance use
-                substance_result = (
-                    supabase.table(HEALTHCARE_TABLES["substance_history"])
-                    .select("*")
-                    .eq("group_identifier", patient_id)
-                    .execute()
-                )
-                if substance_result.data:
-                    active_substances = [
-                        s for s in substance_result.data if s.get("use_flag") == 1
-                    ]
-                    high_risk_substances = [
-                        "Heroin",
-                        "Cocaine (Powder)",
-                        "Crack Cocaine",
-                        "Crystal Meth",
-                    ]
-
+                active_substances = active_by_patient.get(patient_id)
+                if active_substances:
                     if len(active_substances) >= 3:
                         risk_factors.append(
                             f"Multiple substance use ({len(active_substances)} substances)"
@@ -474,7 +803,7 @@ def create_patient_resources(mcp: FastMCP):
                         risk_score += 2
 
                     if any(
-                        s["substance"] in high_risk_substances
+                        s["substance"] in HIGH_RISK_SUBSTANCES
                         for s in active_substances
                     ):
                         risk_factors.append("High-risk substance use")
@@ -503,9 +832,9 @@ def create_patient_resources(mcp: FastMCP):
                 high_risk_analysis["high_risk_patients"]
             )
 
-            return json.dumps(high_risk_analysis, indent=2, default=str)  # type: ignore
+            return dumps_json(high_risk_analysis)  # type: ignore
 
         except Exception as e:
-            return json.dumps({"error": f"Failed to identify high-risk patients: {str(e)}"})  # type: ignore
+            return dumps_json({"error": f"Failed to identify high-risk patients: {str(e)}"})  # type: ignore
 
     return mcp
@@ -2,259 +2,613 @@
 Substance use analysis tools for Healthcare MCP Server
 """
 
+import asyncio
+from collections import Counter
 from typing import List, Dict, Any, Optional
+import numpy as np
 import pandas as pd
 from fastmcp import FastMCP
-from config import supabase, HEALTHCARE_TABLES
+from config import get_supabase, HEALTHCARE_TABLES
+from logging_config import get_logger
+from pagination_caching import TTLCache
+
+logger = get_logger("substance_tools")
+
+# Substance records only change when intake data is imported
+SUBSTANCE_CACHE_TTL = 60  # 1 minute
+
+# Substance rows and frames shared by every tool call, in their own cache so
+# invalidate_substance_cache() leaves other cached results alone
+substance_cache = TTLCache(max_size=256, default_ttl=SUBSTANCE_CACHE_TTL)
+
+# Columns the population-wide tools read from substance history
+POPULATION_COLUMNS = "group_identifier,substance,use_flag,pattern_of_use"
+
+# Substances and use patterns that raise a patient's substance risk score;
+# keep in sync with high_risk_substance_users() in database-views.sql
+HIGH_RISK_SUBSTANCES = frozenset(
+    {
+        "Heroin",
+        "Cocaine (Powder)",
+        "Crack Cocaine",
+        "Crystal Meth",
+        "Methadone",
+        "Oxycontin",
+        "Other Opiates",
+    }
+)
+HIGH_RISK_PATTERNS = frozenset({"daily", "continued", "continual"})
+
+# Substances flagged in a single patient's history risk assessment
+PATIENT_HIGH_RISK_SUBSTANCES = frozenset(
+    {"Heroin", "Cocaine (Powder)", "Crack Cocaine", "Crystal Meth"}
+)
+
+
+def invalidate_substance_cache() -> None:
+    """Drop cached substance data, e.g. after substance records change"""
+    substance_cache.clear()
+
+
+def _fetch_substance_history_all() -> List[Dict[str, Any]]:
+    """Every substance history row, limited to POPULATION_COLUMNS"""
+    cache_key = ("rows",)
+    rows = substance_cache.get(cache_key)
+    if rows is None:
+        result = (
+            get_supabase().table(HEALTHCARE_TABLES["substance_history"])
+            .select(POPULATION_COLUMNS)
+            .execute()
+        )
+        rows = result.data or []
+        substance_cache.set(cache_key, rows)
+    return rows
+
+
+def _has_substance_rows() -> bool:
+    """Whether the substance history table holds any rows, from a head-only count"""
+    cache_key = ("has_rows",)
+    has_rows = substance_cache.get(cache_key)
+    if has_rows is None:
+        result = (
+            get_supabase().table(HEALTHCARE_TABLES["substance_history"])
+            .select("group_identifier", count="exact", head=True)
+            .execute()
+        )
+        has_rows = bool(result.count)
+        substance_cache.set(cache_key, has_rows)
+    return has_rows
+
+
+def _fetch_substance_history_by_patient(patient_id: str) -> List[Dict[str, Any]]:
+    """Substance history rows for one patient"""
+    cache_key = ("patient", patient_id)
+    rows = substance_cache.get(cache_key)
+    if rows is None:
+        result = (
+            get_supabase().table(HEALTHCARE_TABLES["substance_history"])
+            .select("*")
+            .eq("group_identifier", patient_id)
+            .execute()
+        )
+        rows = result.data or []
+        substance_cache.set(cache_key, rows)
+    return rows
+
+
+def _rows_to_df(
+    rows: List[Dict[str, Any]], columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Build a DataFrame column by column from Supabase rows
+
+    PostgREST returns every row with the same keys, so the columns are
+    taken from ``columns`` or the first row instead of being inferred
+    from the keys of every row as pd.DataFrame(rows) does.
+    """
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    columns = columns or list(rows[0])
+    return pd.DataFrame({column: [row.get(column) for row in rows] for column in columns})
+
+
+def _substance_frame() -> pd.DataFrame:
+    """Every substance history row as one DataFrame shared by the tools
+
+    Substance and pattern columns are categorical, since a few distinct
+    values repeat across every patient; note that value_counts on them
+    also lists categories with no rows. Callers must not modify the cached
+    frame in place.
+    """
+    cache_key = ("frame",)
+    df = substance_cache.get(cache_key)
+    if df is None:
+        df = _rows_to_df(
+            _fetch_substance_history_all(), POPULATION_COLUMNS.split(",")
+        )
+        if not df.empty:
+            df = df.astype({"substance": "category", "pattern_of_use": "category"})
+        substance_cache.set(cache_key, df)
+    return df
+
+
+def _category_mask(column: pd.Series, category_matches: np.ndarray) -> np.ndarray:
+    """Row mask of a categorical column from a per-category boolean array
+
+    Each row looks up its category code, so string tests run once per
+    distinct value; missing values (code -1) map to False.
+    """
+    return np.append(category_matches, False)[column.cat.codes.to_numpy()]
+
+
+def _compute_patient_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-patient summary of active substance use, indexed by patient
+
+    Columns: active_substance_count, daily_use_count, active_substances
+    (list), uses_high_risk_substance and has_daily_use (any daily or
+    continued pattern, as in high_risk_substance_users()).
+    """
+    if df.empty:
+        return pd.DataFrame()
+    active_df = df[df["use_flag"] == 1]
+
+    # Flag every row once, then reduce all patients in a single groupby
+    substances = active_df["substance"]
+    patterns = active_df["pattern_of_use"]
+    pattern_categories = patterns.cat.categories.str.lower()
+    flags = active_df.assign(
+        # Plain strings, so substances can be aggregated into lists
+        substance=substances.astype(object),
+        is_daily=_category_mask(patterns, pattern_categories == "daily"),
+        is_high_risk_substance=_category_mask(
+            substances, substances.cat.categories.isin(HIGH_RISK_SUBSTANCES)
+        ),
+        is_high_risk_pattern=_category_mask(
+            patterns, pattern_categories.isin(HIGH_RISK_PATTERNS)
+        ),
+    )
+    return flags.groupby("group_identifier", sort=False).agg(
+        active_substance_count=("substance", "size"),
+        daily_use_count=("is_daily", "sum"),
+        active_substances=("substance", list),
+        uses_high_risk_substance=("is_high_risk_substance", "any"),
+        has_daily_use=("is_high_risk_pattern", "any"),
+    )
+
+
+def _patient_rollup() -> pd.DataFrame:
+    """Per-patient rollup of the shared substance frame, computed once
+
+    Callers must not modify the cached frame in place.
+    """
+    cache_key = ("rollup",)
+    rollup = substance_cache.get(cache_key)
+    if rollup is None:
+        rollup = _compute_patient_rollup(_substance_frame())
+        substance_cache.set(cache_key, rollup)
+    return rollup
+
+
+def _risk_indicators_from_rollup(rollup: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Substance risk indicators per patient, taken from the rollup
+
+    Matches high_risk_substance_users(): only patients using a high-risk
+    substance or with a daily/continued pattern are returned.
+    """
+    if rollup.empty:
+        return []
+    # Filter rows and pick the indicator columns in one selection
+    flagged = (
+        rollup["uses_high_risk_substance"].to_numpy() | rollup["has_daily_use"].to_numpy()
+    )
+    indicators = rollup.loc[
+        flagged,
+        [
+            "active_substance_count",
+            "active_substances",
+            "uses_high_risk_substance",
+            "has_daily_use",
+        ],
+    ]
+    return (
+        indicators.rename(columns={"active_substance_count": "substance_count"})
+        .reset_index()
+        .to_dict(orient="records")
+    )
+
+
+def _patient_risk_indicators() -> List[Dict[str, Any]]:
+    """Substance risk indicators of every potentially high-risk patient
+
+    Aggregated in Postgres by high_risk_substance_users(), falling back to
+    the shared patient rollup when the function has not been created.
+    """
+    cache_key = ("risk_indicators",)
+    indicators = substance_cache.get(cache_key)
+    if indicators is None:
+        try:
+            indicators = get_supabase().rpc("high_risk_substance_users").execute().data or []
+        except Exception as e:
+            logger.warning(
+                "Substance risk function unavailable, aggregating locally",
+                error=str(e),
+            )
+            indicators = _risk_indicators_from_rollup(_patient_rollup())
+        substance_cache.set(cache_key, indicators)
+    return indicators
 
 
-def create_substance_tools(mcp: FastMCP):
-    """Create all substance use analysis MCP tools"""
+def _patient_substance_history(patient_id: str) -> Dict[str, Any]:
+    """A patient's substance use profile, cached alongside their rows
 
-    @mcp.tool
-    def get_patient_substance_history(patient_id: str) -> Dict[str, Any]:
-        """
-        Get complete substance use history for a specific patient
+    Shared by the history and timeline tools; errors are not cached.
+    """
+    cache_key = ("history", patient_id)
+    history = substance_cache.get(cache_key)
+    if history is not None:
+        return history
 
-        Args:
-            patient_id: Patient group identifier
+    try:
+        records = _fetch_substance_history_by_patient(patient_id)
 
-        Returns:
-            Complete substance use profile for the patient
-        """
+        if not records:
+            history = {
+                "message": f"No substance use history found for patient {patient_id}"
+            }
+            substance_cache.set(cache_key, history)
+            return history
+
+        # Split, group and risk-flag the records in a single pass; the
+        # fetched dicts are returned as-is, already JSON-ready, rather
+        # than copied through a DataFrame that would turn nulls into NaN
+        active_substances = []
+        inactive_substances = []
+        pattern_analysis = {}
+        high_risk_substances = []
+        daily_use_substances = []
+        for record in records:
+            use_flag = record.get("use_flag")
+            if use_flag == 0:
+                inactive_substances.append(record)
+            elif use_flag == 1:
+                active_substances.append(record)
+                substance = record["substance"]
+                pattern = record.get("pattern_of_use", "Unknown")
+                pattern_analysis.setdefault(pattern, []).append(substance)
+                # frozenset lookups beat np.isin here: a patient has tens of
+                # rows, too few to amortize building a string array
+                if substance in PATIENT_HIGH_RISK_SUBSTANCES:
+                    high_risk_substances.append(record)
+                if (pattern or "").lower() == "daily":
+                    daily_use_substances.append(record)
+
+        history = {
+            "patient_id": patient_id,
+            "total_substances_tracked": len(records),
+            "active_substance_count": len(active_substances),
+            "inactive_substance_count": len(inactive_substances),
+            "active_substances": active_substances,
+            "inactive_substances": inactive_substances,
+            "usage_patterns": pattern_analysis,
+            "risk_assessment": {
+                "high_risk_substances": high_risk_substances,
+                "daily_use_substances": daily_use_substances,
+                "multiple_active_substances": len(active_substances) > 3,
+            },
+        }
+        substance_cache.set(cache_key, history)
+        return history
+
+    except Exception as e:
+        return {"error": f"Failed to retrieve substance history: {str(e)}"}
+
+
+def _risk_scores(
+    uses_high_risk: np.ndarray, has_daily_use: np.ndarray, substance_counts: np.ndarray
+) -> np.ndarray:
+    """Substance risk score per patient, combined in one vectorized pass
+
+    High-risk substance +3, daily/continued use +2, three or more active
+    substances +1.
+    """
+    return (
+        3 * uses_high_risk.astype(np.int8)
+        + 2 * has_daily_use.astype(np.int8)
+        + (substance_counts >= 3).astype(np.int8)
+    )
+
+
+def _ordered_counts(counts: Counter, limit: Optional[int] = None) -> Dict[str, int]:
+    """Counts ordered by frequency, then by value, optionally truncated"""
+    ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return dict(ordered[:limit])
+
+
+def _population_stats_from_rows(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Population substance use summary tallied in one pass over the rows
+
+    Same shape as substance_population_stats() in database-views.sql; a few
+    counters are cheaper than building a DataFrame for a handful of counts.
+    Empty when there are no substance records.
+    """
+    if not rows:
+        return {}
+
+    patients = set()
+    substance_counts = Counter()
+    pattern_counts = Counter()
+    patient_substance_counts = Counter()
+    daily_use_patients = set()
+    for row in rows:
+        patient_id = row["group_identifier"]
+        patients.add(patient_id)
+        if row.get("use_flag") != 1:
+            continue
+        substance_counts[row["substance"]] += 1
+        patient_substance_counts[patient_id] += 1
+        pattern = row.get("pattern_of_use")
+        if pattern is not None:
+            pattern_counts[pattern] += 1
+            if pattern.lower() == "daily":
+                daily_use_patients.add(patient_id)
+
+    multiple_substance_patients = {
+        patient_id
+        for patient_id, count in patient_substance_counts.items()
+        if count >= 3
+    }
+    average_substances = (
+        round(sum(patient_substance_counts.values()) / len(patient_substance_counts), 2)
+        if patient_substance_counts
+        else None
+    )
+
+    return {
+        "population_analysis": {
+            "total_patients": len(patients),
+            "total_substance_records": len(rows),
+            "patients_with_active_use": len(patient_substance_counts),
+            "high_risk_patients": len(multiple_substance_patients | daily_use_patients),
+        },
+        "most_common_substances": _ordered_counts(substance_counts, 10),
+        "usage_patterns": _ordered_counts(pattern_counts),
+        "risk_indicators": {
+            "patients_with_multiple_substances": len(multiple_substance_patients),
+            "patients_with_daily_use": len(daily_use_patients),
+            "average_substances_per_patient": average_substances,
+        },
+    }
+
+
+def _substance_population_stats() -> Optional[Dict[str, Any]]:
+    """Population substance use summary, or None when there are no records
+
+    Aggregated in Postgres by substance_population_stats(), falling back to
+    tallying the cached substance rows when the function has not been
+    created.
+    """
+    cache_key = ("population_stats",)
+    stats = substance_cache.get(cache_key)
+    if stats is None:
         try:
-            result = (
-                supabase.table(HEALTHCARE_TABLES["substance_history"])
-                .select("*")
-                .eq("group_identifier", patient_id)
-                .execute()
+            stats = get_supabase().rpc("substance_population_stats").execute().data
+        except Exception as e:
+            logger.warning(
+                "Substance statistics function unavailable, aggregating locally",
+                error=str(e),
             )
-
-            if not result.data:
-                return {
-                    "message": f"No substance use history found for patient {patient_id}"
+            stats = _population_stats_from_rows(_fetch_substance_history_all())
+        substance_cache.set(cache_key, stats)
+    if not stats or not stats["population_analysis"]["total_substance_records"]:
+        return None
+    return stats
+
+
+def _analyze_substance_patterns() -> Dict[str, Any]:
+    """Population-level substance use analysis; runs in a worker thread"""
+    try:
+        stats = _substance_population_stats()
+
+        if stats is None:
+            return {"message": "No substance use data found"}
+
+        return stats
+
+    except Exception as e:
+        return {"error": f"Failed to analyze substance patterns: {str(e)}"}
+
+
+def _score_high_risk_substance_users() -> Dict[str, Any]:
+    """Risk-scored high-risk substance users; runs in a worker thread"""
+    try:
+        indicators = _patient_risk_indicators()
+        # No indicators may just mean no high-risk patients; only an empty
+        # table gets the no-data message
+        if not indicators and not _has_substance_rows():
+            return {"message": "No substance use data found"}
+        count = len(indicators)
+        scores = _risk_scores(
+            np.fromiter(
+                (p["uses_high_risk_substance"] for p in indicators), bool, count
+            ),
+            np.fromiter((p["has_daily_use"] for p in indicators), bool, count),
+            np.fromiter((p["substance_count"] for p in indicators), np.int64, count),
+        )
+
+        # Highest score first; the stable sort keeps ties in indicator order
+        high_risk_patients = []
+        for i in np.argsort(-scores, kind="stable"):
+            if scores[i] < 2:  # Threshold for high risk
+                break
+            patient = indicators[i]
+            risk_factors = [
+                factor
+                for factor, present in (
+                    ("Uses high-risk substances", patient["uses_high_risk_substance"]),
+                    ("Daily/continued use pattern", patient["has_daily_use"]),
+                    ("Multiple active substances", patient["substance_count"] >= 3),
+                )
+                if present
+            ]
+            high_risk_patients.append(
+                {
+                    "patient_id": patient["group_identifier"],
+                    "risk_score": int(scores[i]),
+                    "risk_factors": risk_factors,
+                    "active_substances": patient["active_substances"],
+                    "substance_count": patient["substance_count"],
                 }
+            )
 
-            # Separate active and inactive substances
-            active_substances = [
-                record for record in result.data if record.get("use_flag") == 1
-            ]
-            inactive_substances = [
-                record for record in result.data if record.get("use_flag") == 0
-            ]
+        return {
+            "high_risk_patient_count": len(high_risk_patients),
+            "patients": high_risk_patients,
+            "risk_criteria": {
+                "high_risk_substances": sorted(HIGH_RISK_SUBSTANCES),
+                "high_risk_patterns": sorted(HIGH_RISK_PATTERNS),
+                "scoring": "High-risk substances: +3, Daily use: +2, Multiple substances: +1",
+            },
+        }
 
-            # Group by usage patterns
-            pattern_analysis = {}
-            for record in active_substances:
-                pattern = record.get("pattern_of_use", "Unknown")
-                if pattern not in pattern_analysis:
-                    pattern_analysis[pattern] = []
-                pattern_analysis[pattern].append(record["substance"])
+    except Exception as e:
+        return {"error": f"Failed to identify high-risk patients: {str(e)}"}
 
+
+def _compare_substance_use(assessment_type: str) -> Dict[str, Any]:
+    """Substance use versus latest assessment scores; runs in a worker thread"""
+    try:
+        if assessment_type not in ["ptsd", "phq", "gad", "who"]:
             return {
-                "patient_id": patient_id,
-                "total_substances_tracked": len(result.data),
-                "active_substance_count": len(active_substances),
-                "inactive_substance_count": len(inactive_substances),
-                "active_substances": active_substances,
-                "inactive_substances": inactive_substances,
-                "usage_patterns": pattern_analysis,
-                "risk_assessment": {
-                    "high_risk_substances": [
-                        s
-                        for s in active_substances
-                        if s["substance"]
-                        in [
-                            "Heroin",
-                            "Cocaine (Powder)",
-                            "Crack Cocaine",
-                            "Crystal Meth",
-                        ]
-                    ],
-                    "daily_use_substances": [
-                        s
-                        for s in active_substances
-                        if s.get("pattern_of_use", "").lower() == "daily"
-                    ],
-                    "multiple_active_substances": len(active_substances) > 3,
-                },
+                "error": "Invalid assessment type. Choose from: ptsd, phq, gad, who"
             }
 
-        except Exception as e:
-            return {"error": f"Failed to retrieve substance history: {str(e)}"}
+        # Get substance use data
+        substance_df = _substance_frame()
 
-    @mcp.tool
-    def analyze_substance_patterns_across_patients() -> Dict[str, Any]:
-        """
-        Analyze substance use patterns across all patients
-
-        Returns:
-            Population-level substance use analysis
-        """
-        try:
-            result = (
-                supabase.table(HEALTHCARE_TABLES["substance_history"])
-                .select("*")
-                .execute()
-            )
+        # Get assessment data
+        assessment_result = (
+            get_supabase().table(HEALTHCARE_TABLES[assessment_type]).select("*").execute()
+        )
 
-            if not result.data:
-                return {"message": "No substance use data found"}
-
-            df = pd.DataFrame(result.data)
+        if substance_df.empty or not assessment_result.data:
+            return {
+                "message": f"Insufficient data for {assessment_type} and substance use comparison"
+            }
 
-            # Most commonly used substances
-            active_substances = df[df["use_flag"] == 1]
-            substance_counts = active_substances["substance"].value_counts()
+        assessment_df = _rows_to_df(assessment_result.data)
 
-            # Usage patterns analysis
-            pattern_counts = active_substances["pattern_of_use"].value_counts()
+        # Substance use metrics per patient
+        substance_metrics = _patient_rollup()[
+            ["active_substance_count", "daily_use_count"]
+        ]
 
-            # Patient risk levels
-            patient_risk = (
-                active_substances.groupby("group_identifier")
-                .agg(
-                    {
-                        "substance": "count",
-                        "pattern_of_use": lambda x: (x == "daily").sum(),
-                    }
-                )
-                .rename(
-                    columns={
-                        "substance": "active_substance_count",
-                        "pattern_of_use": "daily_use_count",
-                    }
-                )
+        # Latest assessment per patient. assessment_date is ISO text, so
+        # the strings are compared as resources._latest_by_patient and the
+        # *_latest views do: mixed date shapes and offsets never fail to
+        # parse, and rows without a date sort last instead of being dropped
+        latest_assessments = (
+            assessment_df.sort_values(
+                "assessment_date", ascending=False, kind="stable", na_position="last"
             )
+            .drop_duplicates("group_identifier")
+            .set_index("group_identifier")
+        )
 
-            high_risk_patients = patient_risk[
-                (patient_risk["active_substance_count"] >= 3)
-                | (patient_risk["daily_use_count"] >= 1)
-            ]
+        # Merge datasets
+        merged_data = substance_metrics.join(latest_assessments, how="inner")
 
+        if len(merged_data) == 0:
             return {
-                "population_analysis": {
-                    "total_patients": df["group_identifier"].nunique(),
-                    "total_substance_records": len(df),
-                    "patients_with_active_use": active_substances[
-                        "group_identifier"
-                    ].nunique(),
-                    "high_risk_patients": len(high_risk_patients),
-                },
-                "most_common_substances": substance_counts.head(10).to_dict(),
-                "usage_patterns": pattern_counts.to_dict(),
-                "risk_indicators": {
-                    "patients_with_multiple_substances": len(
-                        patient_risk[patient_risk["active_substance_count"] >= 3]
-                    ),
-                    "patients_with_daily_use": len(
-                        patient_risk[patient_risk["daily_use_count"] >= 1]
-                    ),
-                    "average_substances_per_patient": round(
-                        patient_risk["active_substance_count"].mean(), 2
-                    ),
-                },
+                "message": "No patients found with both substance use and assessment data"
             }
 
-        except Exception as e:
-            return {"error": f"Failed to analyze substance patterns: {str(e)}"}
-
-    @mcp.tool
-    def get_high_risk_substance_users() -> List[Dict[str, Any]]:
-        """
-        Identify patients with high-risk substance use patterns
-
-        Returns:
-            List of patients flagged as high-risk based on substance use
-        """
-        try:
-            result = (
-                supabase.table(HEALTHCARE_TABLES["substance_history"])
-                .select("*")
-                .execute()
+        # Calculate correlations and comparisons
+        analysis = {
+            "patient_count": len(merged_data),
+            "substance_use_vs_scores": {},
+            "high_vs_low_substance_use": {},
+        }
+
+        # Identify score columns (numeric columns excluding identifiers)
+        score_columns = [
+            col
+            for col in merged_data.columns
+            if col not in ["group_identifier", "assessment_date", "unique_id"]
+        ]
+        numeric_columns = (
+            merged_data[score_columns].select_dtypes(include=["number"]).columns
+        )
+
+        if len(numeric_columns) > 0:
+            # Bucket patients into high/low substance use and average
+            # every score column for both buckets in one groupby
+            counts = merged_data["active_substance_count"].to_numpy()
+            bucket = np.where(
+                counts >= 3, "high", np.where(counts <= 1, "low", None)
             )
+            bucket_means = merged_data[numeric_columns].groupby(bucket).mean()
+
+            if {"high", "low"} <= set(bucket_means.index):
+                high_means = bucket_means.loc["high"]
+                low_means = bucket_means.loc["low"]
+                comparable = (high_means.notna() & low_means.notna()).to_numpy()
+                analysis["high_vs_low_substance_use"] = {
+                    col: {
+                        "high_substance_use_avg": float(high_means[col]),
+                        "low_substance_use_avg": float(low_means[col]),
+                        "difference": float(high_means[col] - low_means[col]),
+                    }
+                    for col in numeric_columns[comparable]
+                }
 
-            if not result.data:
-                return {"message": "No substance use data found"}  # type: ignore
-
-            df = pd.DataFrame(result.data)
-            active_df = df[df["use_flag"] == 1]
-
-            # Define high-risk substances
-            high_risk_substances = [
-                "Heroin",
-                "Cocaine (Powder)",
-                "Crack Cocaine",
-                "Crystal Meth",
-                "Methadone",
-                "Oxycontin",
-                "Other Opiates",
-            ]
-
-            # Define high-risk patterns
-            high_risk_patterns = ["daily", "continued", "continual"]
-
-            high_risk_patients = []
+        return analysis
 
-            for patient_id in active_df["group_identifier"].unique():
-                patient_data = active_df[active_df["group_identifier"] == patient_id]
+    except Exception as e:
+        return {
+            "error": f"Failed to compare substance use with {assessment_type} scores: {str(e)}"
+        }  # type: ignore
 
-                # Risk factors
-                uses_high_risk_substances = (
-                    patient_data["substance"].isin(high_risk_substances).any()
-                )
-                has_daily_use = (
-                    patient_data["pattern_of_use"]
-                    .str.lower()
-                    .isin(high_risk_patterns)
-                    .any()
-                )
-                multiple_substances = len(patient_data) >= 3
 
-                risk_score = 0
-                risk_factors = []
+def create_substance_tools(mcp: FastMCP):
+    """Create all substance use analysis MCP tools"""
 
-                if uses_high_risk_substances:
-                    risk_score += 3
-                    risk_factors.append("Uses high-risk substances")
+    @mcp.tool
+    def get_patient_substance_history(patient_id: str) -> Dict[str, Any]:
+        """
+        Get complete substance use history for a specific patient
 
-                if has_daily_use:
-                    risk_score += 2
-                    risk_factors.append("Daily/continued use pattern")
+        Args:
+            patient_id: Patient group identifier
 
-                if multiple_substances:
-                    risk_score += 1
-                    risk_factors.append("Multiple active substances")
+        Returns:
+            Complete substance use profile for the patient
+        """
+        return _patient_substance_history(patient_id)
 
-                if risk_score >= 2:  # Threshold for high risk
-                    high_risk_patients.append(
-                        {
-                            "patient_id": patient_id,
-                            "risk_score": risk_score,
-                            "risk_factors": risk_factors,
-                            "active_substances": patient_data["substance"].tolist(),
-                            "substance_count": len(patient_data),
-                        }
-                    )
+    # The population tools are pandas-bound; running them in worker threads
+    # keeps concurrent tool calls from queueing behind each other on the
+    # event loop
+    @mcp.tool
+    async def analyze_substance_patterns_across_patients() -> Dict[str, Any]:
+        """
+        Analyze substance use patterns across all patients
 
-            # Sort by risk score
-            high_risk_patients.sort(key=lambda x: x["risk_score"], reverse=True)
+        Returns:
+            Population-level substance use analysis
+        """
+        return await asyncio.to_thread(_analyze_substance_patterns)
 
-            return {
-                "high_risk_patient_count": len(high_risk_patients),
-                "patients": high_risk_patients,
-                "risk_criteria": {
-                    "high_risk_substances": high_risk_substances,
-                    "high_risk_patterns": high_risk_patterns,
-                    "scoring": "High-risk substances: +3, Daily use: +2, Multiple substances: +1",
-                },
-            }  # type: ignore
+    @mcp.tool
+    async def get_high_risk_substance_users() -> List[Dict[str, Any]]:
+        """
+        Identify patients with high-risk substance use patterns
 
-        except Exception as e:
-            return {"error": f"Failed to identify high-risk patients: {str(e)}"}  # type: ignore
+        Returns:
+            List of patients flagged as high-risk based on substance use
+        """
+        return await asyncio.to_thread(_score_high_risk_substance_users)
 
     @mcp.tool
-    def compare_substance_use_by_assessment_scores(
+    async def compare_substance_use_by_assessment_scores(
         assessment_type: str = "ptsd",
     ) -> Dict[str, Any]:
         """
@@ -266,115 +620,7 @@ def create_substance_tools(mcp: FastMCP):
         Returns:
             Correlation analysis between substance use and assessment scores
         """
-        try:
-            if assessment_type not in ["ptsd", "phq", "gad", "who"]:
-                return {
-                    "error": "Invalid assessment type. Choose from: ptsd, phq, gad, who"
-                }
-
-            # Get substance use data
-            substance_result = (
-                supabase.table(HEALTHCARE_TABLES["substance_history"])
-                .select("*")
-                .execute()
-            )
-
-            # Get assessment data
-            assessment_result = (
-                supabase.table(HEALTHCARE_TABLES[assessment_type]).select("*").execute()
-            )
-
-            if not substance_result.data or not assessment_result.data:
-                return {
-                    "message": f"Insufficient data for {assessment_type} and substance use comparison"
-                }
-
-            substance_df = pd.DataFrame(substance_result.data)
-            assessment_df = pd.DataFrame(assessment_result.data)
-
-            # Calculate substance use metrics per patient
-            substance_metrics = (
-                substance_df[substance_df["use_flag"] == 1]
-                .groupby("group_identifier")
-                .agg(
-                    {
-                        "substance": "count",
-                        "pattern_of_use": lambda x: (x.str.lower() == "daily").sum(),
-                    }
-                )
-                .rename(
-                    columns={
-                        "substance": "active_substance_count",
-                        "pattern_of_use": "daily_use_count",
-                    }
-                )
-            )
-
-            # Get latest assessment scores per patient
-            latest_assessments = (
-                assessment_df.sort_values("assessment_date", ascending=False)
-                .groupby("group_identifier")
-                .first()
-            )
-
-            # Merge datasets
-            merged_data = substance_metrics.join(latest_assessments, how="inner")
-
-            if len(merged_data) == 0:
-                return {
-                    "message": "No patients found with both substance use and assessment data"
-                }
-
-            # Calculate correlations and comparisons
-            analysis = {
-                "patient_count": len(merged_data),
-                "substance_use_vs_scores": {},
-                "high_vs_low_substance_use": {},
-            }
-
-            # Identify score columns (numeric columns excluding identifiers)
-            score_columns = [
-                col
-                for col in merged_data.columns
-                if col not in ["group_identifier", "assessment_date", "unique_id"]
-            ]
-            numeric_columns = (
-                merged_data[score_columns].select_dtypes(include=["number"]).columns
-            )
-
-            if len(numeric_columns) > 0:
-                # Compare high vs low substance use groups
-                high_substance_use = merged_data[
-                    merged_data["active_substance_count"] >= 3
-                ]
-                low_substance_use = merged_data[
-                    merged_data["active_substance_count"] <= 1
-                ]
-
-                for col in numeric_columns:
-                    if (
-                        high_substance_use[col].notna().any()
-                        and low_substance_use[col].notna().any()
-                    ):
-                        analysis["high_vs_low_substance_use"][col] = {
-                            "high_substance_use_avg": float(
-                                high_substance_use[col].mean()
-                            ),
-                            "low_substance_use_avg": float(
-                                low_substance_use[col].mean()
-                            ),
-                            "difference": float(
-                                high_substance_use[col].mean()
-                                - low_substance_use[col].mean()
-                            ),
-                        }
-
-            return analysis
-
-        except Exception as e:
-            return {
-                "error": f"Failed to compare substance use with {assessment_type} scores: {str(e)}"
-            }  # type: ignore
+        return await asyncio.to_thread(_compare_substance_use, assessment_type)
 
     @mcp.tool
     def get_substance_use_timeline(patient_id: str) -> Dict[str, Any]:
@@ -391,7 +637,7 @@ def create_substance_tools(mcp: FastMCP):
             # Note: Current data structure doesn't include timestamps for substance use changes
             # This tool provides current status and suggests data collection improvements
 
-            substance_data = get_patient_substance_history(patient_id)  # type: ignore
+            substance_data = _patient_substance_history(patient_id)
 
             if "error" in substance_data:
                 return substance_data
@@ -6,11 +6,45 @@ Test healthcare MCP server with real patient data
 import sys
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
 
 # Add the current directory to the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import supabase, HEALTHCARE_TABLES
+from resources import PTSD_SCORE_COLUMNS, PHQ_SCORE_COLUMNS
+
+# Assessment tables fetched for the selected patient
+PATIENT_ASSESSMENT_TABLES = ("ptsd", "phq", "substance_history")
+
+# Question columns in question order (PCL-5 has 20 items, PHQ-9 has 9),
+# as resources.py scores them
+PTSD_QUESTION_COLUMNS = pd.Index(PTSD_SCORE_COLUMNS)
+PHQ_QUESTION_COLUMNS = pd.Index(PHQ_SCORE_COLUMNS)
+
+
+def sample_question_scores(records, question_columns, limit=5):
+    """Select the known question columns present in the records
+
+    Returns the matching columns (in question order) and the first
+    record's scores for up to ``limit`` of them.
+    """
+    df = pd.DataFrame(records)
+    questions = question_columns.intersection(df.columns, sort=False)
+    sample_scores = df[questions[:limit]].head(1).to_dict("records")[0]
+    return questions, sample_scores
+
+
+def fetch_patient_records(table_key, patient_id):
+    """Fetch all records for a patient from one assessment table"""
+    return (
+        supabase.table(HEALTHCARE_TABLES[table_key])
+        .select("*")
+        .eq("group_identifier", patient_id)
+        .execute()
+    )
 
 
 def test_real_patient_data():
@@ -38,14 +72,15 @@ def test_real_patient_data():
             test_patient_id = patient_ids[0]
             print(f"\n2. Testing with patient: {test_patient_id}")
 
+            # Fetch all assessments in parallel so the round-trips overlap
+            with ThreadPoolExecutor(max_workers=len(PATIENT_ASSESSMENT_TABLES)) as executor:
+                ptsd_data, phq_data, substance_data = executor.map(
+                    lambda table_key: fetch_patient_records(table_key, test_patient_id),
+                    PATIENT_ASSESSMENT_TABLES,
+                )
+
             # Test PTSD data retrieval
             print("\n📋 PTSD Assessment Data:")
-            ptsd_data = (
-                supabase.table(HEALTHCARE_TABLES["ptsd"])
-                .select("*")
-                .eq("group_identifier", test_patient_id)
-                .execute()
-            )
 
             if ptsd_data.data:
                 patient_record = ptsd_data.data[0]
@@ -55,16 +90,13 @@ def test_real_patient_data():
                 print(f"   Patient ID: {patient_record.get('group_identifier', 'N/A')}")
 
                 # Show PTSD scores
-                ptsd_questions = [
-                    key
-                    for key in patient_record.keys()
-                    if key.startswith("ptsd_q") and key.endswith("_")
-                ]
+                ptsd_questions, sample_scores = sample_question_scores(
+                    ptsd_data.data, PTSD_QUESTION_COLUMNS
+                )
                 print(f"   PTSD Questions Found: {len(ptsd_questions)}")
 
                 # Show sample scores
-                for i, question in enumerate(ptsd_questions[:5], 1):
-                    score = patient_record.get(question, "N/A")
+                for question, score in sample_scores.items():
                     question_name = (
                         question.replace("ptsd_q", "Q").replace("_", " ").title()
                     )
@@ -72,27 +104,20 @@ def test_real_patient_data():
 
             # Test PHQ data retrieval
             print("\n📋 PHQ-9 Assessment Data:")
-            phq_data = (
-                supabase.table(HEALTHCARE_TABLES["phq"])
-                .select("*")
-                .eq("group_identifier", test_patient_id)
-                .execute()
-            )
 
             if phq_data.data:
                 phq_record = phq_data.data[0]
                 print(f"   Assessment Date: {phq_record.get('assessment_date', 'N/A')}")
 
                 # Show PHQ scores
-                phq_questions = [
-                    key for key in phq_record.keys() if key.startswith("phq_q")
-                ]
+                phq_questions, sample_scores = sample_question_scores(
+                    phq_data.data, PHQ_QUESTION_COLUMNS
+                )
                 print(f"   PHQ Questions Found: {len(phq_questions)}")
 
-                for i, question in enumerate(phq_questions[:5], 1):
-                    score = phq_record.get(question, "N/A")
+                for question, score in sample_scores.items():
                     question_name = (
-                        question.replace("phq_q", "Q").replace("_", " ").title()
+                        question.replace("col_", "Q").replace("_", " ").title()
                     )
                     print(f"   {question_name}: {score}")
             else:
@@ -100,12 +125,6 @@ def test_real_patient_data():
 
             # Test Substance History
             print("\n💊 Substance Use History:")
-            substance_data = (
-                supabase.table(HEALTHCARE_TABLES["substance_history"])
-                .select("*")
-                .eq("group_identifier", test_patient_id)
-                .execute()
-            )
 
             if substance_data.data:
                 print(f"   Found {len(substance_data.data)} substance use records")
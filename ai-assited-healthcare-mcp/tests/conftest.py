@@ -1,10 +1,16 @@
 """
 Pytest configuration and fixtures for Healthcare MCP Server tests
+
+The suite is safe to shard with pytest-xdist (``pytest -n auto``): shared
+fixtures only hold immutable data or tool registrations, and database
+clients are patched per test. Run benchmarks in a single process with
+``-p no:xdist``.
 """
 
 import pytest
 import os
 import sys
+from types import SimpleNamespace
 from unittest.mock import Mock, MagicMock
 from typing import Dict, Any, List
 
@@ -118,18 +124,136 @@ def mock_patient_ids():
     """Sample patient IDs for testing"""
     return ["PT001", "PT002", "PT003", "PT004", "PT005"]
 
+class StubMCP:
+    """Minimal stand-in for FastMCP that records registered tools and resources"""
+    __slots__ = ("tools", "tools_by_name", "resources_by_uri")
+    
+    def __init__(self):
+        self.tools = []
+        self.tools_by_name = {}
+        self.resources_by_uri = {}
+    
+    def tool(self, func):
+        """Register a tool and return it unchanged, like @mcp.tool"""
+        self.tools.append(func)
+        self.tools_by_name[func.__name__] = func
+        return func
+    
+    def resource(self, uri):
+        """Register a resource under its URI template, like @mcp.resource"""
+        def register(func):
+            self.resources_by_uri[uri] = func
+            return func
+        return register
+
+class FakeQuery:
+    """Chainable query over one fake table, applying the filters tools use"""
+    
+    def __init__(self, name, rows):
+        self._name = name
+        self._rows = rows
+        self._columns = ()
+        self._head = False
+        self._filters = []
+        self._order = None
+        self._limit = None
+    
+    def select(self, columns="*", count=None, head=None):
+        if columns != "*":
+            self._columns = tuple(column.strip() for column in columns.split(","))
+        self._head = bool(head)
+        return self
+    
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+    
+    def range(self, *args):
+        return self
+    
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+    
+    def gt(self, column, value):
+        self._filters.append(lambda row: row.get(column) > value)
+        return self
+    
+    def gte(self, column, value):
+        self._filters.append(lambda row: row.get(column) >= value)
+        return self
+    
+    def limit(self, count):
+        self._limit = count
+        return self
+    
+    def execute(self):
+        if isinstance(self._rows, Exception):
+            raise self._rows
+        if isinstance(self._rows, dict):
+            return SimpleNamespace(data=self._rows, count=None)
+        for column in self._columns:
+            if self._rows and not any(column in row for row in self._rows):
+                raise Exception(f"column {self._name}.{column} does not exist")
+        rows = [row for row in self._rows if all(f(row) for f in self._filters)]
+        count = len(rows)
+        if self._order is not None:
+            column, desc = self._order
+            rows = sorted(rows, key=lambda row: row.get(column), reverse=desc)
+        if self._head:
+            # HEAD requests return the count without any rows
+            return SimpleNamespace(data=[], count=count)
+        return SimpleNamespace(data=rows[: self._limit], count=count)
+
+class FakeSupabase:
+    """Fake Supabase client serving fixed tables and recording every query
+    
+    ``tables`` maps table, view and RPC function names to their rows, or to
+    a dict an RPC returns as-is. Names missing from ``tables`` or mapped to
+    an exception fail when executed, like relations that have not been
+    created. ``queried`` lists every table and function name in call order.
+    """
+    
+    def __init__(self, tables):
+        self.tables = tables
+        self.queried = []
+    
+    @property
+    def queries(self):
+        """Number of tables and functions queried so far"""
+        return len(self.queried)
+    
+    def table(self, name):
+        self.queried.append(name)
+        missing = Exception(f"relation {name} does not exist")
+        return FakeQuery(name, self.tables.get(name, missing))
+    
+    def rpc(self, name, params=None):
+        self.queried.append(name)
+        missing = Exception(f"function {name} does not exist")
+        return FakeQuery(name, self.tables.get(name, missing))
+
 @pytest.fixture
 def mock_mcp_server():
-    """Mock FastMCP server for testing"""
-    mock_server = Mock()
-    mock_server.tool = Mock()
+    """Stub FastMCP server for testing"""
+    return StubMCP()
+
+@pytest.fixture(scope="session")
+def built_tools():
+    """Build the assessment tools once per test session
     
-    # Mock tool decorator - return the function unchanged
-    def mock_tool_decorator(func):
-        return func
+    The tool factory only registers closures, and the tools resolve
+    module globals such as ``get_supabase`` when called, so per-test patches
+    still apply to the shared functions.
+    
+    Returns:
+        Dictionary of tool functions keyed by name
+    """
+    from assessment_tools import create_assessment_tools
     
-    mock_server.tool = mock_tool_decorator
-    return mock_server
+    mock_server = StubMCP()
+    create_assessment_tools(mock_server)
+    return mock_server.tools_by_name
 
 @pytest.fixture 
 def mock_logger():
@@ -0,0 +1,32 @@
+"""
+Benchmarks for request model construction
+
+Every MCP tool call validates its arguments through these models, so a
+slower validator taxes every request. Requires pytest-benchmark; run with:
+
+    pytest tests/performance --benchmark-enable --benchmark-only
+"""
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from models import PatientIdRequest, PaginationRequest
+
+pytestmark = pytest.mark.performance
+
+
+@pytest.mark.benchmark(group="models")
+def test_patient_id_construction_perf(benchmark):
+    """Benchmark PatientIdRequest validation and normalisation"""
+    request = benchmark(PatientIdRequest, patient_id="pt001")
+
+    assert request.patient_id == "PT001"
+
+
+@pytest.mark.benchmark(group="models")
+def test_pagination_offset_perf(benchmark):
+    """Benchmark PaginationRequest construction plus offset lookup"""
+    offset = benchmark(lambda: PaginationRequest(page=3, page_size=20).offset)
+
+    assert offset == 40
@@ -0,0 +1,30 @@
+"""
+Unit tests for server configuration
+"""
+
+import pytest
+
+from config import MCPConfig
+
+
+class TestMCPConfig:
+    """Test MCP server settings read from the environment"""
+    
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            ("", False),
+            ("0", False),
+            ("false", False),
+            ("Off", False),
+            ("2", True),
+            ("true", True),
+            (" YES ", True),
+            ("pretty", False),
+        ],
+    )
+    def test_json_indent_is_an_on_off_flag(self, monkeypatch, value, expected):
+        """Test MCP_JSON_INDENT parses as a flag and never fails on bad values"""
+        monkeypatch.setenv("MCP_JSON_INDENT", value)
+        
+        assert MCPConfig().pretty_json is expected
@@ -3,182 +3,131 @@ Unit tests for health check functionality
 """
 
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from datetime import datetime
-import psutil
+from itertools import chain, repeat
+from unittest.mock import Mock, patch
+from types import SimpleNamespace
 
+import health_check
 from health_check import create_health_check_tools
+from tests.conftest import FakeSupabase, StubMCP
 
 class TestHealthCheckTools:
     """Test health check tool creation and functionality"""
     
+    @pytest.fixture(scope="class")
+    @classmethod
+    def health_tools(cls):
+        """Register the health check tools once for the whole class
+        
+        The tools look up get_supabase, psutil and _clock on the
+        health_check module at call time, so per-test patches still apply.
+        """
+        mock_server = StubMCP()
+        create_health_check_tools(mock_server)
+        return mock_server.tools_by_name
+    
     @pytest.fixture
-    def mock_mcp(self):
-        """Create mock MCP server"""
-        mock_server = Mock()
-        tools = []
-        
-        def mock_tool_decorator(func):
-            tools.append(func)
-            return func
-        
-        mock_server.tool = mock_tool_decorator
-        mock_server.tools = tools
-        return mock_server
+    def hc_env(self, monkeypatch):
+        """Patch the health check Supabase client and psutil functions
+        
+        Keyword arguments name the attribute to replace; ``supabase`` is
+        the client returned by health_check.get_supabase and everything
+        else is set on psutil.
+        """
+        def _apply(**attributes):
+            for name, value in attributes.items():
+                if name == "supabase":
+                    monkeypatch.setattr(health_check, "get_supabase", lambda client=value: client)
+                else:
+                    monkeypatch.setattr(health_check.psutil, name, value)
+        return _apply
     
-    def test_create_health_check_tools(self, mock_mcp):
+    def test_create_health_check_tools(self, mock_mcp_server):
         """Test health check tools are created successfully"""
-        result = create_health_check_tools(mock_mcp)
+        result = create_health_check_tools(mock_mcp_server)
         
-        assert result == mock_mcp
-        assert len(mock_mcp.tools) == 3  # health_check, health_check_simple, get_server_info
+        assert result == mock_mcp_server
+        assert mock_mcp_server.tools_by_name.keys() == {
+            "health_check", "health_check_simple", "get_server_info"
+        }
     
-    @patch('health_check.supabase')
-    @patch('health_check.psutil.virtual_memory')
-    def test_health_check_healthy_status(self, mock_memory, mock_supabase, mock_mcp):
-        """Test health check returns healthy status when all checks pass"""
-        # Setup mocks
-        mock_memory.return_value.percent = 50.0
-        mock_memory.return_value.available = 8 * (1024**3)  # 8GB
-        
-        mock_result = Mock()
-        mock_result.data = [{"count": 100}]
-        mock_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value = mock_result
-        
-        # Create health check tools
-        create_health_check_tools(mock_mcp)
-        health_check_func = mock_mcp.tools[0]  # First tool should be health_check
+    @pytest.mark.parametrize(
+        "mem_pct,db_exc,db_time,status,memory_status,db_status,db_message",
+        [
+            (50.0, None, 0.1, "healthy", "healthy", "healthy", "Database responsive"),
+            (85.0, None, 0.1, "degraded", "warning", "healthy", "Database responsive"),
+            (50.0, Exception("Database connection failed"), 0.1, "unhealthy", "healthy",
+             "error", "Database connectivity failed"),
+            (50.0, None, 6.0, "degraded", "healthy", "warning", "responding slowly"),
+        ],
+        ids=["healthy", "high_memory", "database_failure", "slow_database"],
+    )
+    def test_health_check_status(self, mem_pct, db_exc, db_time, status, memory_status,
+                                 db_status, db_message, hc_env, monkeypatch, health_tools):
+        """Test overall status follows the memory and database checks"""
+        mock_supabase = Mock()
+        if db_exc is not None:
+            mock_supabase.table.side_effect = db_exc
+        else:
+            mock_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value.data = [{"count": 100}]
+        
+        hc_env(
+            supabase=mock_supabase,
+            virtual_memory=lambda: SimpleNamespace(percent=mem_pct, available=8 * (1024**3)),
+        )
+        # Clock starts at 0 and then reads db_time, however often it is called
+        monkeypatch.setattr(health_check, "_clock", chain([0.0], repeat(db_time)).__next__)
         
-        # Execute health check
-        result = health_check_func()
+        result = health_tools["health_check"](include_dependencies=True)
         
-        assert result["status"] == "healthy"
-        assert "timestamp" in result
-        assert "version" in result
-        assert "uptime_seconds" in result
-        assert "checks" in result
+        assert result["status"] == status
+        assert {"timestamp", "version", "uptime_seconds"} <= result.keys()
         assert result["checks"]["server"]["status"] == "healthy"
-        assert result["checks"]["memory"]["status"] == "healthy"
-    
-    @patch('health_check.supabase')
-    @patch('health_check.psutil.virtual_memory')
-    def test_health_check_degraded_status_high_memory(self, mock_memory, mock_supabase, mock_mcp):
-        """Test health check returns degraded status with high memory usage"""
-        # Setup high memory usage
-        mock_memory.return_value.percent = 85.0  # Above 75% threshold
-        mock_memory.return_value.available = 2 * (1024**3)  # 2GB
-        
-        mock_result = Mock()
-        mock_result.data = [{"count": 100}]
-        mock_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value = mock_result
-        
-        create_health_check_tools(mock_mcp)
-        health_check_func = mock_mcp.tools[0]
-        
-        result = health_check_func()
-        
-        assert result["status"] == "degraded"
-        assert result["checks"]["memory"]["status"] == "warning"
-        assert result["checks"]["memory"]["usage_percent"] == 85.0
-    
-    @patch('health_check.supabase')
-    @patch('health_check.psutil.virtual_memory')
-    def test_health_check_database_failure(self, mock_memory, mock_supabase, mock_mcp):
-        """Test health check handles database connection failure"""
-        # Setup memory mock
-        mock_memory.return_value.percent = 50.0
-        mock_memory.return_value.available = 8 * (1024**3)
-        
-        # Setup database failure
-        mock_supabase.table.side_effect = Exception("Database connection failed")
-        
-        create_health_check_tools(mock_mcp)
-        health_check_func = mock_mcp.tools[0]
-        
-        result = health_check_func(include_dependencies=True)
-        
-        assert result["status"] == "unhealthy"
-        assert result["checks"]["database"]["status"] == "error"
-        assert "Database connectivity failed" in result["checks"]["database"]["message"]
-    
-    @patch('health_check.supabase')
-    @patch('health_check.psutil.virtual_memory')
-    @patch('health_check.time.time')
-    def test_health_check_slow_database_response(self, mock_time, mock_memory, mock_supabase, mock_mcp):
-        """Test health check detects slow database response"""
-        # Setup time mocks to simulate slow response
-        mock_time.side_effect = [0, 6.0]  # 6 second response time
-        
-        # Setup memory mock
-        mock_memory.return_value.percent = 50.0
-        mock_memory.return_value.available = 8 * (1024**3)
-        
-        # Setup database mock
-        mock_result = Mock()
-        mock_result.data = [{"count": 100}]
-        mock_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value = mock_result
-        
-        create_health_check_tools(mock_mcp)
-        health_check_func = mock_mcp.tools[0]
-        
-        result = health_check_func(include_dependencies=True)
-        
-        assert result["status"] == "degraded"
-        assert result["checks"]["database"]["status"] == "warning"
-        assert result["checks"]["database"]["response_time_seconds"] == 6.0
-        assert "responding slowly" in result["checks"]["database"]["message"]
+        assert result["checks"]["memory"]["status"] == memory_status
+        assert result["checks"]["memory"]["usage_percent"] == mem_pct
+        assert result["checks"]["database"]["status"] == db_status
+        assert db_message in result["checks"]["database"]["message"]
+        if db_exc is None:
+            assert result["checks"]["database"]["response_time_seconds"] == db_time
     
-    @patch('health_check.HEALTHCARE_TABLES', {'ptsd': 'PTSD', 'phq': 'PHQ'})
-    @patch('health_check.supabase')
-    def test_health_check_table_accessibility(self, mock_supabase, mock_mcp):
+    @pytest.mark.parametrize("table_status", [
+        pytest.param({"PTSD": "ok", "PHQ": "err"}, id="phq-error"),
+        pytest.param({"PTSD": "err", "PHQ": "ok"}, id="ptsd-error"),
+        pytest.param({"PTSD": "ok", "PHQ": "ok"}, id="all-accessible"),
+    ])
+    def test_health_check_table_accessibility(self, table_status, hc_env, monkeypatch, health_tools):
         """Test health check verifies table accessibility"""
-        # Setup main database check
-        mock_result = Mock()
-        mock_result.data = [{"count": 100}]
-        mock_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value = mock_result
-        
-        # Setup table accessibility checks
-        def table_side_effect(table_name):
-            mock_table = Mock()
-            mock_table.select.return_value = mock_table
-            mock_table.limit.return_value = mock_table
-            
-            if table_name == 'PTSD':
-                mock_table.execute.return_value.data = [{"id": 1}]
-            else:  # PHQ table
-                mock_table.execute.side_effect = Exception("Table not accessible")
-            
-            return mock_table
-        
-        mock_supabase.table.side_effect = table_side_effect
-        
-        create_health_check_tools(mock_mcp)
-        health_check_func = mock_mcp.tools[0]
+        monkeypatch.setattr(health_check, "HEALTHCARE_TABLES", {"ptsd": "PTSD", "phq": "PHQ"})
+        hc_env(
+            supabase=FakeSupabase({
+                name: [{"count": 1}] if status == "ok" else Exception("Table not accessible")
+                for name, status in table_status.items()
+            }),
+            virtual_memory=lambda: SimpleNamespace(percent=50.0, available=8 * (1024**3)),
+        )
         
-        result = health_check_func(include_dependencies=True)
+        result = health_tools["health_check"](include_dependencies=True)
         
-        assert result["status"] == "degraded"  # One table failed
-        assert "tables" in result["checks"]
-        assert result["checks"]["tables"]["ptsd"]["status"] == "accessible"
-        assert result["checks"]["tables"]["phq"]["status"] == "error"
+        expected = {
+            key: "accessible" if table_status[name] == "ok" else "error"
+            for key, name in (("ptsd", "PTSD"), ("phq", "PHQ"))
+        }
+        assert {key: check["status"] for key, check in result["checks"]["tables"].items()} == expected
+        any_error = "error" in expected.values()
+        assert (result["status"] != "healthy") is any_error
     
-    def test_health_check_simple(self, mock_mcp):
+    def test_health_check_simple(self, health_tools):
         """Test simple health check returns basic status"""
-        create_health_check_tools(mock_mcp)
-        health_check_simple_func = mock_mcp.tools[1]  # Second tool
+        health_check_simple_func = health_tools["health_check_simple"]
         
         result = health_check_simple_func()
         
         assert result["status"] == "healthy"
-        assert "timestamp" in result
-        assert "version" in result
-        assert "uptime_seconds" in result
-        
-        # Should not have detailed checks
-        assert "checks" not in result
+        # Basic fields only, no detailed checks
+        assert result.keys() == {"status", "timestamp", "version", "uptime_seconds"}
     
     @patch('health_check.psutil.Process')
-    def test_get_server_info(self, mock_process, mock_mcp):
+    def test_get_server_info(self, mock_process, health_tools):
         """Test get server info returns detailed server information"""
         # Setup process mocks
         mock_proc = Mock()
@@ -187,65 +136,49 @@ class TestHealthCheckTools:
         mock_proc.memory_info.return_value.rss = 100 * 1024 * 1024  # 100MB
         mock_process.return_value = mock_proc
         
-        create_health_check_tools(mock_mcp)
-        get_server_info_func = mock_mcp.tools[2]  # Third tool
+        get_server_info_func = health_tools["get_server_info"]
         
         result = get_server_info_func()
         
-        assert "name" in result
-        assert "version" in result
-        assert "start_time" in result
-        assert "uptime_seconds" in result
-        assert "process_id" in result
-        assert result["process_id"] == 12345
-        assert "memory_usage_mb" in result
-        assert result["memory_usage_mb"] == 100.0
-        assert "available_tables" in result
-        assert "table_count" in result
+        assert {
+            "name", "version", "start_time", "uptime_seconds", "process_id",
+            "memory_usage_mb", "available_tables", "table_count"
+        } <= result.keys()
+        assert {k: result[k] for k in ("process_id", "memory_usage_mb")} == {
+            "process_id": 12345, "memory_usage_mb": 100.0
+        }
     
     @patch('health_check.psutil.Process')
-    def test_get_server_info_error_handling(self, mock_process, mock_mcp):
+    def test_get_server_info_error_handling(self, mock_process, health_tools):
         """Test get server info handles errors gracefully"""
         # Setup process to raise exception
         mock_process.side_effect = Exception("Process info not available")
         
-        create_health_check_tools(mock_mcp)
-        get_server_info_func = mock_mcp.tools[2]
+        get_server_info_func = health_tools["get_server_info"]
         
         result = get_server_info_func()
         
-        assert "error" in result
+        assert {"error", "timestamp"} <= result.keys()
         assert "Failed to retrieve server info" in result["error"]
-        assert "timestamp" in result
     
-    @patch('health_check.supabase')
-    @patch('health_check.psutil.virtual_memory')
-    @patch('health_check.psutil.cpu_percent')
-    @patch('health_check.psutil.disk_usage')
-    @patch('health_check.psutil.pids')
-    def test_health_check_with_performance_metrics(
-        self, mock_pids, mock_disk, mock_cpu, mock_memory, mock_supabase, mock_mcp
-    ):
+    def test_health_check_with_performance_metrics(self, hc_env, health_tools):
         """Test health check includes performance metrics when requested"""
-        # Setup mocks
-        mock_memory.return_value.percent = 50.0
-        mock_memory.return_value.available = 8 * (1024**3)
-        mock_cpu.return_value = 25.5
-        
-        mock_disk_usage = Mock()
-        mock_disk_usage.used = 50 * (1024**3)  # 50GB used
-        mock_disk_usage.total = 100 * (1024**3)  # 100GB total
-        mock_disk_usage.free = 50 * (1024**3)  # 50GB free
-        mock_disk.return_value = mock_disk_usage
-        
-        mock_pids.return_value = list(range(150))  # 150 processes
-        
-        mock_result = Mock()
-        mock_result.data = [{"count": 100}]
-        mock_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value = mock_result
+        mock_supabase = Mock()
+        mock_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value.data = [{"count": 100}]
+        
+        hc_env(
+            supabase=mock_supabase,
+            virtual_memory=lambda: SimpleNamespace(percent=50.0, available=8 * (1024**3)),
+            cpu_percent=lambda interval=None: 25.5,
+            disk_usage=lambda path: SimpleNamespace(
+                used=50 * (1024**3),  # 50GB used
+                total=100 * (1024**3),  # 100GB total
+                free=50 * (1024**3)  # 50GB free
+            ),
+            pids=lambda: list(range(150))  # 150 processes
+        )
         
-        create_health_check_tools(mock_mcp)
-        health_check_func = mock_mcp.tools[0]
+        health_check_func = health_tools["health_check"]
         
         result = health_check_func(
             include_dependencies=True,
@@ -255,8 +188,9 @@ class TestHealthCheckTools:
         assert result["status"] == "healthy"
         assert "performance_metrics" in result
         
-        metrics = result["performance_metrics"]
-        assert metrics["cpu_usage_percent"] == 25.5
-        assert metrics["disk_usage_percent"] == 50.0
-        assert metrics["disk_free_gb"] == 50.0
-        assert metrics["process_count"] == 150
\ No newline at end of file
+        assert result["performance_metrics"] == {
+            "cpu_usage_percent": 25.5,
+            "disk_usage_percent": 50.0,
+            "disk_free_gb": 50.0,
+            "process_count": 150
+        }
\ No newline at end of file
@@ -5,6 +5,7 @@ Unit tests for Pydantic models
 import pytest
 from datetime import date
 from pydantic import ValidationError
+from pydantic_core import SchemaValidator
 from models import (
     PatientIdRequest,
     AssessmentRequest, 
@@ -19,48 +20,35 @@ from models import (
     AssessmentType
 )
 
+D_JAN1 = date(2024, 1, 1)
+D_JAN15 = date(2024, 1, 15)
+D_JAN31 = date(2024, 1, 31)
+
 class TestPatientIdRequest:
     """Test PatientIdRequest model validation"""
     
-    def test_valid_patient_id(self):
-        """Test valid patient ID"""
-        request = PatientIdRequest(patient_id="PT001")
-        assert request.patient_id == "PT001"
-    
-    def test_patient_id_converted_to_uppercase(self):
-        """Test patient ID is converted to uppercase"""
-        request = PatientIdRequest(patient_id="pt001")
-        assert request.patient_id == "PT001"
-    
-    def test_patient_id_stripped(self):
-        """Test patient ID whitespace is stripped"""
-        request = PatientIdRequest(patient_id="  PT001  ")
-        assert request.patient_id == "PT001"
+    @pytest.mark.parametrize("patient_id, expected", [
+        pytest.param("PT001", "PT001", id="valid"),
+        pytest.param("pt001", "PT001", id="converted-to-uppercase"),
+        pytest.param("  PT001  ", "PT001", id="whitespace-stripped"),
+    ])
+    def test_valid_patient_id(self, patient_id, expected):
+        """Test valid patient IDs are normalized"""
+        request = PatientIdRequest(patient_id=patient_id)
+        assert request.patient_id == expected
     
-    def test_empty_patient_id_fails(self):
-        """Test empty patient ID fails validation"""
+    @pytest.mark.parametrize("patient_id, error_type", [
+        pytest.param("", "patient_id_empty", id="empty"),
+        pytest.param("   ", "patient_id_empty", id="whitespace-only"),
+        pytest.param("A", "string_too_short", id="too-short"),
+        pytest.param("A" * 51, "string_too_long", id="too-long"),
+    ])
+    def test_invalid_patient_id_fails(self, patient_id, error_type):
+        """Test empty, too short and too long patient IDs fail validation"""
         with pytest.raises(ValidationError) as exc_info:
-            PatientIdRequest(patient_id="")
+            PatientIdRequest(patient_id=patient_id)
         
-        assert "Patient ID cannot be empty" in str(exc_info.value)
-    
-    def test_whitespace_only_patient_id_fails(self):
-        """Test whitespace-only patient ID fails validation"""
-        with pytest.raises(ValidationError) as exc_info:
-            PatientIdRequest(patient_id="   ")
-        
-        assert "Patient ID cannot be empty" in str(exc_info.value)
-    
-    def test_patient_id_too_short_fails(self):
-        """Test patient ID less than 2 characters fails"""
-        with pytest.raises(ValidationError):
-            PatientIdRequest(patient_id="A")
-    
-    def test_patient_id_too_long_fails(self):
-        """Test patient ID more than 50 characters fails"""
-        long_id = "A" * 51
-        with pytest.raises(ValidationError):
-            PatientIdRequest(patient_id=long_id)
+        assert exc_info.value.errors()[0]["type"] == error_type
 
 class TestAssessmentRequest:
     """Test AssessmentRequest model validation"""
@@ -95,73 +83,51 @@ class TestAssessmentRequest:
 class TestPaginationRequest:
     """Test PaginationRequest model validation"""
     
-    def test_valid_pagination(self):
-        """Test valid pagination parameters"""
-        request = PaginationRequest(page=2, page_size=25)
-        assert request.page == 2
-        assert request.page_size == 25
-        assert request.offset == 25  # (2-1) * 25
+    @pytest.mark.parametrize("params, page, page_size, offset", [
+        pytest.param({}, 1, 50, 0, id="defaults"),
+        pytest.param({"page": 2, "page_size": 25}, 2, 25, 25, id="valid"),
+        pytest.param({"page": 1, "page_size": 10}, 1, 10, 0, id="first-page"),
+        pytest.param({"page": 3, "page_size": 20}, 3, 20, 40, id="third-page"),
+        pytest.param({"page": 5, "page_size": 100}, 5, 100, 400, id="fifth-page"),
+    ])
+    def test_pagination_values(self, params, page, page_size, offset):
+        """Test pagination values and offset calculation"""
+        request = PaginationRequest(**params)
+        assert request.page == page
+        assert request.page_size == page_size
+        assert request.offset == offset  # (page-1) * page_size
     
-    def test_default_pagination(self):
-        """Test default pagination values"""
-        request = PaginationRequest()
-        assert request.page == 1
-        assert request.page_size == 50
-        assert request.offset == 0
-    
-    def test_page_minimum_validation(self):
-        """Test page must be at least 1"""
-        with pytest.raises(ValidationError):
-            PaginationRequest(page=0)
-    
-    def test_page_size_minimum_validation(self):
-        """Test page_size must be at least 1"""
-        with pytest.raises(ValidationError):
-            PaginationRequest(page_size=0)
-    
-    def test_page_size_maximum_validation(self):
-        """Test page_size cannot exceed 500"""
+    @pytest.mark.parametrize("params", [
+        pytest.param({"page": 0}, id="page-below-minimum"),
+        pytest.param({"page_size": 0}, id="page-size-below-minimum"),
+        pytest.param({"page_size": 501}, id="page-size-above-maximum"),
+    ])
+    def test_invalid_pagination_fails(self, params):
+        """Test page must be at least 1 and page_size between 1 and 500"""
         with pytest.raises(ValidationError):
-            PaginationRequest(page_size=501)
-    
-    def test_offset_calculation(self):
-        """Test offset calculation for different pages"""
-        request1 = PaginationRequest(page=1, page_size=10)
-        request2 = PaginationRequest(page=3, page_size=20)
-        request3 = PaginationRequest(page=5, page_size=100)
-        
-        assert request1.offset == 0
-        assert request2.offset == 40  # (3-1) * 20
-        assert request3.offset == 400  # (5-1) * 100
+            PaginationRequest(**params)
 
 class TestDateRangeFilter:
     """Test DateRangeFilter model validation"""
     
     def test_valid_date_range(self):
         """Test valid date range"""
-        start = date(2024, 1, 1)
-        end = date(2024, 1, 31)
-        
-        filter_obj = DateRangeFilter(start_date=start, end_date=end)
-        assert filter_obj.start_date == start
-        assert filter_obj.end_date == end
+        filter_obj = DateRangeFilter(start_date=D_JAN1, end_date=D_JAN31)
+        assert filter_obj.start_date == D_JAN1
+        assert filter_obj.end_date == D_JAN31
     
     def test_end_date_before_start_date_fails(self):
         """Test end date before start date fails validation"""
-        start = date(2024, 1, 31)
-        end = date(2024, 1, 1)
-        
         with pytest.raises(ValidationError) as exc_info:
-            DateRangeFilter(start_date=start, end_date=end)
+            DateRangeFilter(start_date=D_JAN31, end_date=D_JAN1)
         
-        assert "End date must be after start date" in str(exc_info.value)
+        assert exc_info.value.errors()[0]["type"] == "date_range_invalid"
     
     def test_same_start_and_end_date_allowed(self):
         """Test same start and end date is allowed"""
-        same_date = date(2024, 1, 15)
-        filter_obj = DateRangeFilter(start_date=same_date, end_date=same_date)
-        assert filter_obj.start_date == same_date
-        assert filter_obj.end_date == same_date
+        filter_obj = DateRangeFilter(start_date=D_JAN15, end_date=D_JAN15)
+        assert filter_obj.start_date == D_JAN15
+        assert filter_obj.end_date == D_JAN15
     
     def test_optional_dates(self):
         """Test optional date parameters"""
@@ -268,4 +234,28 @@ class TestHealthCheckRequest:
         
         # Valid bounds
         HealthCheckRequest(timeout_seconds=5)  # Should not raise
-        HealthCheckRequest(timeout_seconds=120)  # Should not raise
\ No newline at end of file
+        HealthCheckRequest(timeout_seconds=120)  # Should not raise
+
+class TestCompiledValidation:
+    """Test request models validate through pydantic-core"""
+    
+    @pytest.mark.parametrize("model", [
+        PatientIdRequest,
+        AssessmentRequest,
+        PaginationRequest,
+        DateRangeFilter,
+        AnalyticsRequest,
+        SubstanceAnalysisRequest,
+        PopulationStatsRequest,
+        HealthCheckRequest,
+    ])
+    def test_models_use_core_validator(self, model):
+        """Test each model is backed by a compiled SchemaValidator"""
+        assert isinstance(model.__pydantic_validator__, SchemaValidator)
+    
+    def test_request_models_are_frozen(self):
+        """Test validated requests cannot be modified after construction"""
+        request = PatientIdRequest(patient_id="PT001")
+        
+        with pytest.raises(ValidationError):
+            request.patient_id = "PT002"
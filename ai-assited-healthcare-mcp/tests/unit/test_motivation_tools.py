@@ -0,0 +1,109 @@
+"""
+Unit tests for motivation theme extraction
+"""
+
+import pytest
+from unittest.mock import patch
+
+from motivation_tools import create_motivation_tools
+from pagination_caching import cache
+from tests.conftest import FakeSupabase
+
+
+def motivation_supabase(tables):
+    """Fake Supabase client with the motivation source tables, empty unless given"""
+    return FakeSupabase({"BPS": [], "PHP": [], "AHCM": [], **tables})
+
+
+class TestMotivationTools:
+    """Test motivation theme extraction tool"""
+
+    @pytest.fixture
+    def get_motivation_themes(self, mock_mcp_server):
+        """Register the motivation tools and return the theme tool"""
+        create_motivation_tools(mock_mcp_server)
+        return mock_mcp_server.tools_by_name["get_motivation_themes"]
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        """Start every test with an empty result cache"""
+        cache.clear()
+        yield
+        cache.clear()
+
+    def test_create_motivation_tools(self, mock_mcp_server):
+        """Test motivation tools are created successfully"""
+        result = create_motivation_tools(mock_mcp_server)
+
+        assert result == mock_mcp_server
+        assert list(mock_mcp_server.tools_by_name) == ["get_motivation_themes"]
+
+    def test_counts_every_mention_but_limits_sample_quotes(self, get_motivation_themes):
+        """Test theme counts include all matches while quotes stop at three"""
+        text = " ".join(
+            f"Entry {i}: I want to see my family every weekend." for i in range(6)
+        )
+        mock_supabase = motivation_supabase(
+            {"BPS": [{"group_identifier": "PT001", "ext_motivation": text}]}
+        )
+
+        with patch("motivation_tools.get_supabase", return_value=mock_supabase):
+            result = get_motivation_themes("PT001")
+
+        family = next(t for t in result["themes"] if t["name"] == "Family")
+        assert family["count"] == 6
+        assert len(family["sample_quotes"]) == 3
+        assert result["metadata"]["patients_with_motivation_data"] == 1
+
+    def test_score_and_ahcm_themes_are_counted(self, get_motivation_themes):
+        """Test score-based and AHCM themes contribute their weights"""
+        mock_supabase = motivation_supabase(
+            {
+                "BPS": [{"group_identifier": "PT001", "bps_family": "4"}],
+                "AHCM": [{"group_identifier": "PT001", "feel_lonely": "Yes"}],
+            }
+        )
+
+        with patch("motivation_tools.get_supabase", return_value=mock_supabase):
+            result = get_motivation_themes("PT001")
+
+        counts = {theme["name"]: theme["count"] for theme in result["themes"]}
+        assert counts == {"Family": 2, "Social": 1}
+        assert result["metadata"]["data_sources"] == ["BPS", "AHCM"]
+        assert result["metadata"]["patients_with_motivation_data"] == 2
+
+    def test_no_motivation_data(self, get_motivation_themes):
+        """Test empty tables produce an empty theme list"""
+        with patch("motivation_tools.get_supabase", return_value=motivation_supabase({})):
+            result = get_motivation_themes()
+
+        assert result["themes"] == []
+        assert "No motivation themes found" in result["metadata"]["message"]
+
+    def test_results_are_cached_per_patient(self, get_motivation_themes):
+        """Test repeat requests are served from cache without querying"""
+        mock_supabase = motivation_supabase(
+            {"BPS": [{"group_identifier": "PT001", "bps_family": 5}]}
+        )
+
+        with patch("motivation_tools.get_supabase", return_value=mock_supabase):
+            first = get_motivation_themes("PT001")
+            query_count = mock_supabase.queries
+            second = get_motivation_themes("PT001")
+
+            assert second == first
+            assert mock_supabase.queries == query_count
+
+            get_motivation_themes("PT002")
+            assert mock_supabase.queries == 2 * query_count
+
+    def test_failed_source_results_are_not_cached(self, get_motivation_themes):
+        """Test partial results are recomputed when a source query failed"""
+        # No tables, so every source query fails
+        mock_supabase = FakeSupabase({})
+
+        with patch("motivation_tools.get_supabase", return_value=mock_supabase):
+            get_motivation_themes("PT001")
+            get_motivation_themes("PT001")
+
+        assert mock_supabase.queries == 6  # BPS, PHP, AHCM twice
@@ -0,0 +1,538 @@
+"""
+Unit tests for pagination and caching utilities
+"""
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import Mock, patch
+
+from models import PaginationRequest
+from tests.conftest import FakeSupabase
+from pagination_caching import (
+    COUNT_TTL_SECONDS,
+    TTLCache,
+    cache,
+    cached,
+    clear_cache,
+    get_cache_stats,
+    get_total_count,
+    paginate_list,
+    paginate_supabase_query,
+    paginate_supabase_query_stream,
+    start_cache_warming,
+    warm_cache_for_common_queries,
+)
+
+
+def make_query_mock(data):
+    """Build a chainable Supabase query mock returning the given rows"""
+    mock_query = Mock()
+    for method in ("select", "eq", "gt", "gte", "order", "limit", "range"):
+        getattr(mock_query, method).return_value = mock_query
+    mock_query.execute.return_value.data = data
+    return mock_query
+
+
+class TestPaginateSupabaseQuery:
+    """Test paginated Supabase queries"""
+
+    @pytest.fixture
+    def mock_supabase(self):
+        """Patch the Supabase client used for pagination"""
+        with patch("pagination_caching.get_supabase") as get_supabase:
+            yield get_supabase.return_value
+
+    def test_offset_pagination(self, mock_supabase):
+        """Test pages without a cursor use an offset range"""
+        mock_query = make_query_mock([{"unique_id": 11}, {"unique_id": 12}])
+        mock_supabase.table.return_value = mock_query
+
+        result = paginate_supabase_query(
+            "PTSD",
+            order_by="unique_id",
+            pagination=PaginationRequest(page=2, page_size=10),
+        )
+
+        mock_query.range.assert_called_once_with(10, 19)
+        mock_query.gt.assert_not_called()
+        assert result["pagination"]["has_more"] is False
+        assert result["pagination"]["next_cursor"] is None
+
+    def test_keyset_pagination(self, mock_supabase):
+        """Test pages with a cursor seek past the last-seen key"""
+        mock_query = make_query_mock([{"unique_id": 21}, {"unique_id": 22}])
+        mock_supabase.table.return_value = mock_query
+
+        result = paginate_supabase_query(
+            "PTSD",
+            order_by="assessment_date",
+            pagination=PaginationRequest(page_size=2, cursor_value=20),
+        )
+
+        mock_query.gt.assert_called_once_with("unique_id", 20)
+        mock_query.order.assert_called_once_with("unique_id")
+        mock_query.limit.assert_called_once_with(2)
+        mock_query.range.assert_not_called()
+        assert result["data"] == [{"unique_id": 21}, {"unique_id": 22}]
+        assert result["pagination"]["has_more"] is True
+        assert result["pagination"]["next_cursor"] == 22
+
+    @pytest.mark.parametrize(
+        "order_by, expected_cursor",
+        [("unique_id", 12), ("assessment_date.desc", None)],
+    )
+    def test_offset_page_cursor_requires_cursor_ordering(
+        self, mock_supabase, order_by, expected_cursor
+    ):
+        """Test full offset pages only hand out a cursor when ordered by it"""
+        mock_query = make_query_mock([{"unique_id": 11}, {"unique_id": 12}])
+        mock_supabase.table.return_value = mock_query
+
+        result = paginate_supabase_query(
+            "PTSD",
+            order_by=order_by,
+            pagination=PaginationRequest(page_size=2),
+        )
+
+        assert result["pagination"]["has_more"] is True
+        assert result["pagination"]["next_cursor"] == expected_cursor
+
+    def test_operator_filters(self, mock_supabase):
+        """Test dict filters are applied with their query operator"""
+        mock_query = make_query_mock([])
+        mock_supabase.table.return_value = mock_query
+
+        paginate_supabase_query(
+            "PTSD",
+            filters={"assessment_date": {"gte": "2024-01-01"}, "group_identifier": "PT001"},
+        )
+
+        mock_query.gte.assert_called_once_with("assessment_date", "2024-01-01")
+        mock_query.eq.assert_called_once_with("group_identifier", "PT001")
+
+    def test_counts_are_cached_until_ttl_bucket_rolls_over(self):
+        """Test repeat counts reuse the cached value within the TTL"""
+        mock_query = make_query_mock([])
+        mock_query.execute.return_value.count = 7
+        ttl_ns = COUNT_TTL_SECONDS * 1_000_000_000
+
+        with patch("pagination_caching.get_supabase") as get_supabase, \
+                patch("pagination_caching.time.monotonic_ns") as mock_clock:
+            get_supabase.return_value.table.return_value = mock_query
+
+            mock_clock.return_value = 0
+            assert get_total_count("PTSD") == 7
+            mock_clock.return_value = ttl_ns - 1
+            assert get_total_count("PTSD") == 7
+            assert mock_query.execute.call_count == 1
+
+            mock_clock.return_value = ttl_ns
+            get_total_count("PTSD")
+            assert mock_query.execute.call_count == 2
+
+    def test_unknown_operator_raises(self, mock_supabase):
+        """Test unsupported filter operators are rejected instead of ignored"""
+        mock_supabase.table.return_value = make_query_mock([])
+
+        with pytest.raises(ValueError, match="Unsupported filter operator"):
+            paginate_supabase_query("PTSD", filters={"total_score": {"between": 5}})
+
+
+
+class TestPaginateSupabaseQueryStream:
+    """Test streaming Supabase queries in keyset chunks"""
+
+    def test_streams_all_chunks(self):
+        """Test chunks are fetched by cursor until a short chunk is returned"""
+        mock_query = make_query_mock([])
+        mock_query.execute.side_effect = [
+            Mock(data=[{"unique_id": 1}, {"unique_id": 2}]),
+            Mock(data=[{"unique_id": 3}, {"unique_id": 4}]),
+            Mock(data=[{"unique_id": 5}]),
+        ]
+
+        with patch("pagination_caching.get_supabase") as get_supabase:
+            get_supabase.return_value.table.return_value = mock_query
+            rows = list(paginate_supabase_query_stream("PTSD", chunk_size=2))
+
+        assert [row["unique_id"] for row in rows] == [1, 2, 3, 4, 5]
+        mock_query.range.assert_called_once_with(0, 1)
+        assert [call.args for call in mock_query.gt.call_args_list] == [
+            ("unique_id", 2),
+            ("unique_id", 4),
+        ]
+
+    def test_missing_cursor_column_raises(self):
+        """Test streaming stops with an error when rows lack the cursor column"""
+        mock_query = make_query_mock([{"group_identifier": "PT001"}])
+
+        with patch("pagination_caching.get_supabase") as get_supabase:
+            get_supabase.return_value.table.return_value = mock_query
+            with pytest.raises(ValueError, match="cursor column"):
+                list(paginate_supabase_query_stream("PTSD", "group_identifier", chunk_size=1))
+
+
+class TestGetTotalCount:
+    """Test cached table counts"""
+
+    @pytest.fixture(autouse=True)
+    def clear_counts(self):
+        """Start every test with no cached counts"""
+        clear_cache()
+        yield
+        clear_cache()
+
+    @pytest.mark.parametrize(
+        "kwargs, expected_mode",
+        [({}, "estimated"), ({"count_mode": "exact"}, "exact")],
+    )
+    def test_count_mode(self, kwargs, expected_mode):
+        """Test counts use the estimated PostgREST count unless exact is requested"""
+        mock_query = make_query_mock([])
+        mock_query.execute.return_value.count = 42
+
+        with patch("pagination_caching.get_supabase") as get_supabase:
+            get_supabase.return_value.table.return_value = mock_query
+            count = get_total_count("PTSD", {"group_identifier": "PT001"}, **kwargs)
+
+        assert count == 42
+        mock_query.select.assert_called_once_with(
+            "unique_id", count=expected_mode, head=True
+        )
+        mock_query.eq.assert_called_once_with("group_identifier", "PT001")
+
+
+class TestCacheWarming:
+    """Test startup cache warming"""
+
+    @pytest.fixture(autouse=True)
+    def clear_counts(self):
+        """Start every test with no cached counts"""
+        clear_cache()
+        yield
+        clear_cache()
+
+    def test_warming_caches_real_table_counts(self):
+        """Test warming counts each table through the client and caches the result"""
+        tables = {
+            name: [{"unique_id": f"{name}-{i}", "group_identifier": "PT001"}
+                   for i in range(rows)]
+            for name, rows in (("PTSD", 3), ("PHQ", 2), ("GAD", 1), ("WHO", 0), ("DERS", 4))
+        }
+        fake_supabase = FakeSupabase(tables)
+
+        with patch("pagination_caching.get_supabase", return_value=fake_supabase):
+            asyncio.run(warm_cache_for_common_queries())
+            assert sorted(fake_supabase.queried) == ["DERS", "GAD", "PHQ", "PTSD", "WHO"]
+
+            counts = {name: get_total_count(name) for name in tables}
+
+        assert counts == {"PTSD": 3, "PHQ": 2, "GAD": 1, "WHO": 0, "DERS": 4}
+        # Every count was cached by warming, so none was fetched again
+        assert fake_supabase.queries == 5
+
+    def test_warms_count_for_each_assessment_table(self):
+        """Test every assessment table count is fetched"""
+        with patch("pagination_caching.get_total_count") as mock_count:
+            asyncio.run(warm_cache_for_common_queries())
+
+        warmed_tables = sorted(call.args[0] for call in mock_count.call_args_list)
+        assert warmed_tables == ["DERS", "GAD", "PHQ", "PTSD", "WHO"]
+
+    def test_failures_do_not_raise(self):
+        """Test a failing table does not abort warming"""
+        with patch("pagination_caching.get_total_count", side_effect=Exception("timeout")) as mock_count:
+            thread = start_cache_warming()
+            thread.join(timeout=5)
+
+        assert not thread.is_alive()
+        assert mock_count.call_count == 5
+
+
+class TestPaginateList:
+    """Test in-memory pagination"""
+
+    def test_copy_returns_list_slice(self):
+        """Test the default path returns a list for the requested page"""
+        result = paginate_list(list(range(25)), PaginationRequest(page=3, page_size=10))
+
+        assert result["data"] == [20, 21, 22, 23, 24]
+        assert result["pagination"]["returned_count"] == 5
+        assert result["pagination"]["has_more"] is False
+
+    def test_no_copy_list_returns_lazy_page(self):
+        """Test lists are paged lazily when copy is disabled"""
+        result = paginate_list(
+            list(range(25)), PaginationRequest(page=2, page_size=10), copy=False
+        )
+
+        assert not isinstance(result["data"], list)
+        assert list(result["data"]) == list(range(10, 20))
+        assert result["pagination"]["returned_count"] == 10
+        assert result["pagination"]["has_more"] is True
+
+    def test_no_copy_dataframe_and_array_return_views(self):
+        """Test DataFrames and arrays are paged by position without copying"""
+        pagination = PaginationRequest(page=2, page_size=2)
+        df = pd.DataFrame({"score": [1, 2, 3, 4, 5]}, index=[10, 20, 30, 40, 50])
+        array = np.arange(5)
+
+        df_page = paginate_list(df, pagination, copy=False)["data"]
+        array_page = paginate_list(array, pagination, copy=False)["data"]
+
+        assert df_page["score"].tolist() == [3, 4]
+        assert array_page.tolist() == [2, 3]
+        assert np.shares_memory(array_page, array)
+
+    def test_page_past_end(self):
+        """Test pages beyond the data report no returned rows"""
+        result = paginate_list([1, 2, 3], PaginationRequest(page=5, page_size=10))
+
+        assert result["data"] == []
+        assert result["pagination"]["returned_count"] == 0
+
+
+class TestTTLCache:
+    """Test TTL cache behaviour"""
+
+    def test_generate_key_is_stable(self):
+        """Test equal arguments produce equal keys regardless of kwarg order"""
+        test_cache = TTLCache()
+
+        key1 = test_cache._generate_key("func", "PTSD", page=1, size=10)
+        key2 = test_cache._generate_key("func", "PTSD", size=10, page=1)
+        key3 = test_cache._generate_key("func", "PHQ", page=1, size=10)
+
+        assert key1 == key2
+        assert key1 != key3
+
+    def test_evicts_least_recently_used(self):
+        """Test a full cache evicts the least recently used entry"""
+        test_cache = TTLCache(max_size=2, num_shards=1)
+        test_cache.set("a", 1)
+        test_cache.set("b", 2)
+        test_cache.get("a")  # "b" is now least recently used
+        test_cache.set("c", 3)
+
+        entries, _ = test_cache._shards[0]
+        assert list(entries) == ["a", "c"]
+        assert test_cache.size() == 2
+
+    def test_hit_refreshes_lru_order(self):
+        """Test a key that was just read is not the next one evicted"""
+        test_cache = TTLCache(max_size=2, num_shards=1)
+        test_cache.set("hot", 1)
+        test_cache.set("b", 2)
+        assert test_cache.get("hot") == 1
+        test_cache.set("c", 3)
+
+        entries, _ = test_cache._shards[0]
+        assert list(entries) == ["hot", "c"]
+        assert test_cache.get("hot") == 1
+        assert test_cache.get("b") is None
+
+    def test_evicted_key_is_a_miss(self):
+        """Test an evicted key is no longer served"""
+        test_cache = TTLCache(max_size=1, num_shards=1)
+        test_cache.set("a", 1)
+        test_cache.set("b", 2)
+
+        assert test_cache.get("a") is None
+
+    def test_overwrite_does_not_evict(self):
+        """Test replacing an existing key in a full cache keeps other entries"""
+        test_cache = TTLCache(max_size=2, num_shards=1)
+        test_cache.set("a", 1)
+        test_cache.set("b", 2)
+        test_cache.set("a", 10)
+
+        assert test_cache.get("a") == 10
+        assert test_cache.get("b") == 2
+
+    def test_expired_entries_are_removed(self):
+        """Test entries are dropped once their TTL has elapsed"""
+        test_cache = TTLCache()
+        with patch("pagination_caching.time.monotonic_ns", return_value=0):
+            test_cache.set("a", 1, ttl=10)
+
+        with patch("pagination_caching.time.monotonic_ns", return_value=9_000_000_000):
+            assert test_cache.get("a") == 1
+
+        with patch("pagination_caching.time.monotonic_ns", return_value=11_000_000_000):
+            assert test_cache.get("a") is None
+        assert test_cache.size() == 0
+
+    def test_shards_share_max_size(self):
+        """Test entries are spread over shards within the overall size limit"""
+        test_cache = TTLCache(max_size=64, num_shards=16)
+        for i in range(200):
+            test_cache.set(("func", i), i)
+
+        assert test_cache.size() <= 64
+        assert test_cache.get(("func", 199)) == 199
+
+        test_cache.clear()
+        assert test_cache.size() == 0
+
+    def test_tracks_hits_and_misses(self):
+        """Test lookups are counted towards the hit ratio"""
+        test_cache = TTLCache()
+        assert test_cache.hit_ratio() == 0.0
+
+        test_cache.set("a", 1)
+        test_cache.get("a")
+        test_cache.get("a")
+        test_cache.get("b")
+
+        assert test_cache._hits == 2
+        assert test_cache._misses == 1
+        assert test_cache.hit_ratio() == pytest.approx(2 / 3)
+
+    def test_global_cache_returns_stored_object_for_any_size(self):
+        """Test the shared cache never copies values, large or small"""
+        rows = [{"group_identifier": f"PT{i:03d}", "total_score": i} for i in range(2000)]
+        small = {"total": 3}
+        try:
+            cache.set("large", rows)
+            cache.set("small", small)
+
+            assert cache.get("large") is rows
+            assert cache.get("small") is small
+        finally:
+            cache.clear()
+
+    def test_missing_key_returns_default(self):
+        """Test a cached None is distinguishable from a miss"""
+        test_cache = TTLCache()
+        sentinel = object()
+        test_cache.set("none", None)
+
+        assert test_cache.get("none", sentinel) is None
+        assert test_cache.get("missing", sentinel) is sentinel
+
+    @pytest.mark.parametrize("hash_algo", ["xxh3", "md5"])
+    def test_unhashable_arguments_use_hashed_key(self, hash_algo):
+        """Test unhashable arguments fall back to a hashed string key"""
+        with patch("pagination_caching.HASH_ALGO", hash_algo):
+            test_cache = TTLCache()
+            key = test_cache._generate_key("func", {"group_identifier": "PT001"})
+            test_cache.set(key, {"total": 3})
+
+            assert isinstance(key, str)
+            assert test_cache.get(key) == {"total": 3}
+
+
+class TestCachedDecorator:
+    """Test the cached decorator"""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        """Start every test with an empty global cache"""
+        cache.clear()
+        yield
+        cache.clear()
+
+    def test_expensive_results_are_cached(self):
+        """Test results slower than the threshold are served from cache"""
+        calls = []
+
+        @cached(ttl=60, min_compute_ns=0)
+        def lookup(table):
+            calls.append(table)
+            return {"table": table}
+
+        assert lookup("PTSD") == {"table": "PTSD"}
+        assert lookup("PTSD") == {"table": "PTSD"}
+        assert calls == ["PTSD"]
+
+    def test_same_named_functions_do_not_share_entries(self):
+        """Test functions with equal names but different owners cache apart"""
+        class PTSDQueries:
+            @staticmethod
+            @cached(ttl=60, min_compute_ns=0)
+            def select_rows(patient_id):
+                return ["ptsd", patient_id]
+
+        class PHQQueries:
+            @staticmethod
+            @cached(ttl=60, min_compute_ns=0)
+            def select_rows(patient_id):
+                return ["phq", patient_id]
+
+        assert PTSDQueries.select_rows("PT001") == ["ptsd", "PT001"]
+        assert PHQQueries.select_rows("PT001") == ["phq", "PT001"]
+
+    def test_cheap_results_are_not_cached(self):
+        """Test results faster than the threshold are recomputed"""
+        calls = []
+
+        @cached(ttl=60, min_compute_ns=10**12)
+        def lookup(table):
+            calls.append(table)
+            return {"table": table}
+
+        lookup("PTSD")
+        lookup("PTSD")
+        assert calls == ["PTSD", "PTSD"]
+
+    @pytest.mark.parametrize("q, expected_calls", [(0.0, 2), (1.0, 1)])
+    def test_admission_probability(self, q, expected_calls):
+        """Test misses are only admitted with probability q"""
+        calls = []
+
+        @cached(ttl=60, min_compute_ns=0, q=q)
+        def lookup(table):
+            calls.append(table)
+            return {"table": table}
+
+        lookup("PTSD")
+        lookup("PTSD")
+        assert len(calls) == expected_calls
+
+    def test_cache_stats_report_hit_ratio(self):
+        """Test cache statistics include hit and miss counts"""
+
+        @cached(ttl=60, min_compute_ns=0)
+        def lookup(table):
+            return {"table": table}
+
+        lookup("PTSD")
+        lookup("PTSD")
+        stats = get_cache_stats()
+
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_empty_results_are_cached_with_negative_ttl(self):
+        """Test None and empty results are cached for the shorter TTL"""
+        calls = []
+
+        @cached(ttl=600, min_compute_ns=0, negative_ttl=30)
+        def lookup(table):
+            calls.append(table)
+            return None
+
+        with patch("pagination_caching.cache.set", wraps=cache.set) as mock_set:
+            assert lookup("PTSD") is None
+            assert lookup("PTSD") is None
+
+        assert calls == ["PTSD"]
+        assert mock_set.call_args.args[2] == 30
+
+    def test_debug_logging_is_skipped_when_disabled(self):
+        """Test cache hit logging is not built when DEBUG is disabled"""
+
+        @cached(ttl=60, min_compute_ns=0)
+        def lookup(table):
+            return {"table": table}
+
+        with patch("pagination_caching.logger") as mock_logger:
+            mock_logger.isEnabledFor.return_value = False
+            lookup("PTSD")
+            lookup("PTSD")
+
+        mock_logger.debug.assert_not_called()
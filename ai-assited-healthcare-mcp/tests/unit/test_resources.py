@@ -0,0 +1,349 @@
+"""
+Tests for patient data resources
+
+Each resource must read a fixed number of tables however many patients
+there are, so a per-patient query loop fails here instead of shipping.
+The helpers behind them are checked against the results they replace.
+"""
+
+import asyncio
+import json
+import math
+import pandas as pd
+import pytest
+from contextlib import contextmanager
+
+import pagination_caching
+import resources
+from pagination_caching import cache
+from resources import (
+    PHQ_SCORE_COLUMNS,
+    PROFILE_RECENT_LIMIT,
+    PTSD_SCORE_COLUMNS,
+    _ColumnStats,
+    _fetch_latest,
+    _severe_latest,
+    _severe_totals,
+    create_patient_resources,
+)
+from tests.conftest import FakeSupabase, StubMCP
+
+
+@contextmanager
+def query_budget(client, budget):
+    """Fail if the enclosed block runs more than ``budget`` queries"""
+    start = client.queries
+    yield
+    used = client.queries - start
+    assert used <= budget, f"ran {used} queries, budget is {budget}"
+
+
+def make_tables(patient_count):
+    """Fake tables, views and functions from database-views.sql for some patients"""
+    patients = [f"PT{i:03d}" for i in range(patient_count)]
+    ptsd = [
+        {
+            "unique_id": f"ptsd-{patient}",
+            "group_identifier": patient,
+            "assessment_date": "2024-01-15",
+            "ptsd_total": 60,
+            **{column: 3 for column in PTSD_SCORE_COLUMNS},
+        }
+        for patient in patients
+    ]
+    phq = [
+        {
+            "unique_id": f"phq-{patient}",
+            "group_identifier": patient,
+            "assessment_date": "2024-01-15",
+            "phq_total": 9,
+            **{column: 1 for column in PHQ_SCORE_COLUMNS},
+        }
+        for patient in patients
+    ]
+    substances = [
+        {"group_identifier": patient, "substance": substance, "use_flag": 1}
+        for patient in patients
+        for substance in ("Alcohol", "Heroin")
+    ]
+    return {
+        "PTSD": ptsd,
+        "PHQ": phq,
+        "GAD": [],
+        "WHO": [],
+        "DERS": [],
+        "DERS_2": [],
+        "Patient Substance History": substances,
+        "ptsd_latest": ptsd,
+        "phq_latest": phq,
+        "gad_latest": [],
+        "who_latest": [],
+        "all_patient_ids": [{"group_identifier": patient} for patient in patients],
+        "assessment_stats": {
+            "total_records": patient_count,
+            "unique_patients": patient_count,
+            "statistics": {},
+        },
+    }
+
+
+def use_client(monkeypatch, client):
+    """Serve every resource query, streamed or not, from ``client``"""
+    monkeypatch.setattr(resources, "get_supabase", lambda: client)
+    monkeypatch.setattr(pagination_caching, "get_supabase", lambda: client)
+    return client
+
+
+@pytest.fixture(scope="module")
+def patient_resources():
+    """Register the patient resources once for the whole module
+    
+    Resources look up their Supabase client at call time, so per-test
+    patches still apply.
+    """
+    mock_server = StubMCP()
+    create_patient_resources(mock_server)
+    return mock_server.resources_by_uri
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty result cache"""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestResourceQueryBudgets:
+    """Test each resource runs a fixed number of queries"""
+    
+    @pytest.fixture(params=[1, 25], ids=["one_patient", "many_patients"])
+    def client(self, request, monkeypatch):
+        """Counting client serving one or many patients to every resource query"""
+        return use_client(monkeypatch, FakeSupabase(make_tables(request.param)))
+    
+    @pytest.mark.parametrize(
+        "uri, args, budget",
+        [
+            ("patient://{patient_id}/complete-profile", ("PT000",), 7),
+            ("patient://{patient_id}/complete-profile/history", ("PT000",), 7),
+            ("assessment://{assessment_type}/latest-scores", ("ptsd",), 1),
+            ("trends://{patient_id}/{timeframe}", ("PT000", "all"), 4),
+            ("population://{assessment_type}/statistics", ("ptsd",), 1),
+            ("high-risk://patients/current", (), 5),
+        ],
+    )
+    def test_query_budget(self, patient_resources, client, uri, args, budget):
+        """Test a resource stays within its query budget"""
+        with query_budget(client, budget):
+            result = patient_resources[uri](*args)
+            if asyncio.iscoroutine(result):
+                result = asyncio.run(result)
+        
+        assert "error" not in json.loads(result)
+    
+    def test_high_risk_reads_every_patient(self, patient_resources, client):
+        """Test the high-risk screen covers all patients within its budget"""
+        patient_count = len(client.tables["all_patient_ids"])
+        
+        with query_budget(client, 5):
+            result = json.loads(patient_resources["high-risk://patients/current"]())
+        
+        assert result["total_high_risk_patients"] == patient_count
+        assert {
+            tuple(patient["risk_factors"]) for patient in result["high_risk_patients"]
+        } == {("Severe PTSD (score: 60)", "High-risk substance use")}
+    
+    def test_fallback_without_views_stays_within_budget(
+        self, patient_resources, client
+    ):
+        """Test high-risk screening without the database views still batches reads"""
+        for name in ("all_patient_ids", "ptsd_latest", "phq_latest", "gad_latest"):
+            del client.tables[name]
+        
+        # Patient IDs: failed view + 3 table scans; each severity screen:
+        # failed total lookup + failed latest view + table scan; substances
+        with query_budget(client, 4 + 3 * 3 + 1):
+            result = json.loads(patient_resources["high-risk://patients/current"]())
+        
+        assert result["total_high_risk_patients"] == len(client.tables["PTSD"])
+
+
+def ptsd_row(unique_id, patient_id, assessment_date, answer, **extra):
+    """PTSD row answering every question with ``answer``"""
+    return {
+        "unique_id": unique_id,
+        "group_identifier": patient_id,
+        "assessment_date": assessment_date,
+        **{column: answer for column in PTSD_SCORE_COLUMNS},
+        **extra,
+    }
+
+
+class TestResourceResults:
+    """Test resource helpers return what the code they replaced returned"""
+    
+    def test_column_stats_match_pandas_describe(self):
+        """Test running statistics agree with Series.describe"""
+        values = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0, 5.5]
+        column_stats = _ColumnStats()
+        for value in values:
+            column_stats.add(value)
+        
+        summary = column_stats.summary()
+        expected = pd.Series(values).describe(percentiles=[0.25, 0.5, 0.75, 0.9, 0.95])
+        assert summary["count"] == expected["count"]
+        assert summary["mean"] == round(expected["mean"], 2)
+        assert summary["median"] == round(expected["50%"], 2)
+        assert summary["std"] == round(expected["std"], 2)
+        assert summary["min"] == expected["min"]
+        assert summary["max"] == expected["max"]
+        assert summary["percentiles"] == {
+            f"{label}th": round(expected[f"{label}%"], 2)
+            for label in (25, 75, 90, 95)
+        }
+    
+    def test_column_stats_single_value_has_no_std(self):
+        """Test one value gives an undefined sample standard deviation"""
+        column_stats = _ColumnStats()
+        column_stats.add(7.0)
+        
+        summary = column_stats.summary()
+        assert math.isnan(summary["std"])
+        assert summary["median"] == summary["min"] == summary["max"] == 7.0
+    
+    def test_severe_totals_count_text_and_missing_answers(self):
+        """Test numeric text is summed while None and other text count as 0"""
+        latest = {
+            "PT001": {"q1": "3", "q2": None},
+            "PT002": {"q1": "not answered", "q2": 5},
+            "PT003": {"q1": 1, "q2": 1},
+            "PT004": {"q1": 4},
+        }
+        
+        assert _severe_totals(latest, ("q1", "q2"), 3) == {
+            "PT001": 3.0,
+            "PT002": 5.0,
+            "PT004": 4.0,
+        }
+        assert _severe_totals({}, ("q1", "q2"), 3) == {}
+    
+    def test_severe_latest_reads_stored_totals(self, monkeypatch):
+        """Test the latest view's stored totals are filtered by threshold"""
+        use_client(monkeypatch, FakeSupabase({
+            "ptsd_latest": [
+                {"unique_id": "a", "group_identifier": "PT001", "ptsd_total": 60},
+                {"unique_id": "b", "group_identifier": "PT002", "ptsd_total": 20},
+            ],
+        }))
+        
+        assert _severe_latest("ptsd", 50) == {"PT001": 60.0}
+    
+    def test_severe_latest_sums_table_without_views(self, monkeypatch):
+        """Test severity falls back to summing each patient's newest table row"""
+        use_client(monkeypatch, FakeSupabase({
+            "PTSD": [
+                ptsd_row("a", "PT001", "2024-01-01", 0),
+                ptsd_row("b", "PT001", "2024-06-01", 3),
+                ptsd_row("c", "PT002", "2024-06-01", 0),
+                ptsd_row("d", "PT002", "2024-01-01", 3),
+            ],
+        }))
+        
+        assert _severe_latest("ptsd", 50) == {"PT001": 60.0}
+    
+    def test_fetch_latest_scans_table_without_view(self, monkeypatch):
+        """Test the newest row per patient comes from the table scan"""
+        use_client(monkeypatch, FakeSupabase({
+            "PTSD": [
+                ptsd_row("a", "PT001", "2024-01-01", 1),
+                ptsd_row("b", "PT002", "2024-03-01", 2),
+                ptsd_row("c", "PT001", "2024-06-01", 3),
+            ],
+        }))
+        
+        latest = _fetch_latest("ptsd")
+        
+        assert list(latest) == ["PT001", "PT002"]
+        assert latest["PT001"]["unique_id"] == "c"
+        assert latest["PT002"]["unique_id"] == "b"
+    
+    def test_trends_first_and_last_skip_missing_values(
+        self, patient_resources, monkeypatch
+    ):
+        """Test first and last values are the first and last answered ones"""
+        use_client(monkeypatch, FakeSupabase({
+            "PTSD": [
+                {"unique_id": "d", "group_identifier": "PT001",
+                 "assessment_date": "2024-04-01", "ptsd_total": None, "sleep": 2},
+                {"unique_id": "b", "group_identifier": "PT001",
+                 "assessment_date": "2024-02-01", "ptsd_total": 50, "sleep": None},
+                {"unique_id": "a", "group_identifier": "PT001",
+                 "assessment_date": "2024-01-01", "ptsd_total": None, "sleep": None},
+                {"unique_id": "c", "group_identifier": "PT001",
+                 "assessment_date": "2024-03-01", "ptsd_total": 40, "sleep": None},
+            ],
+            "PHQ": [], "GAD": [], "WHO": [],
+        }))
+        
+        result = json.loads(patient_resources["trends://{patient_id}/{timeframe}"](
+            "PT001", "all"
+        ))
+        
+        ptsd = result["assessment_trends"]["ptsd"]
+        assert ptsd["assessment_count"] == 4
+        assert ptsd["date_range"]["start"].startswith("2024-01-01")
+        assert ptsd["date_range"]["end"].startswith("2024-04-01")
+        assert ptsd["trends"]["ptsd_total"] == {
+            "first_value": 50.0,
+            "last_value": 40.0,
+            "mean": 45.0,
+            "std": 7.07,
+            "min": 40.0,
+            "max": 50.0,
+            "trend_direction": "improving",
+        }
+        # A column answered once has no trend
+        assert "sleep" not in ptsd["trends"]
+    
+    @pytest.mark.parametrize(
+        "uri, history_key, row_count",
+        [
+            ("patient://{patient_id}/complete-profile", "recent", PROFILE_RECENT_LIMIT),
+            ("patient://{patient_id}/complete-profile/history", "all", 7),
+        ],
+    )
+    def test_profile_shapes(
+        self, patient_resources, monkeypatch, uri, history_key, row_count
+    ):
+        """Test the profile holds recent rows and the history holds every row"""
+        rows = [
+            ptsd_row(f"ptsd-{day}", "PT001", f"2024-01-0{day}", 1)
+            for day in range(1, 8)
+        ]
+        use_client(monkeypatch, FakeSupabase({
+            "PTSD": rows + [ptsd_row("other", "PT002", "2024-02-01", 1)],
+            "PHQ": [], "GAD": [], "WHO": [], "DERS": [], "DERS_2": [],
+            "Patient Substance History": [
+                {"group_identifier": "PT001", "substance": "Alcohol", "use_flag": 1},
+                {"group_identifier": "PT001", "substance": "Tobacco", "use_flag": 0},
+            ],
+        }))
+        
+        profile = json.loads(asyncio.run(patient_resources[uri]("PT001")))
+        
+        ptsd = profile["assessments"]["ptsd"]
+        assert set(ptsd) == {"count", "latest", history_key}
+        assert ptsd["count"] == 7
+        assert ptsd["latest"]["unique_id"] == "ptsd-7"
+        assert [row["unique_id"] for row in ptsd[history_key]] == [
+            f"ptsd-{day}" for day in range(7, 7 - row_count, -1)
+        ]
+        assert profile["assessments"]["phq"] == {
+            "count": 0, "latest": None, history_key: []
+        }
+        assert profile["summary"] == {
+            "total_assessments": 7,
+            "has_substance_data": True,
+            "active_substance_count": 1,
+        }
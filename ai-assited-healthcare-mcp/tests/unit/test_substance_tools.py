@@ -0,0 +1,297 @@
+"""
+Unit tests for substance use analysis tools
+"""
+
+import asyncio
+
+import pytest
+from unittest.mock import patch
+
+from substance_tools import create_substance_tools, invalidate_substance_cache
+from tests.conftest import FakeSupabase, StubMCP
+
+SUBSTANCE_TABLE = "Patient Substance History"
+SUBSTANCE_COLUMNS = ("group_identifier", "substance", "use_flag", "pattern_of_use")
+SUBSTANCE_ROWS = [
+    dict(zip(SUBSTANCE_COLUMNS, row))
+    for row in [
+        ("PT001", "Heroin", 1, "Daily"),
+        ("PT001", "Alcohol", 1, "Weekly"),
+        ("PT001", "Cannabis", 0, "Former use"),
+        ("PT002", "Alcohol", 1, "Weekly"),
+        ("PT002", "Cannabis", 1, "Weekly"),
+        ("PT002", "Tobacco", 1, "Continued"),
+        ("PT003", "Alcohol", 1, "Weekly"),
+    ]
+]
+
+
+class TestSubstanceTools:
+    """Test substance use tools"""
+    
+    @pytest.fixture(scope="class")
+    @classmethod
+    def substance_tools(cls):
+        """Register the substance tools once for the whole class
+        
+        The tools call get_supabase on the substance_tools module at call
+        time, so per-test patches still apply.
+        """
+        mock_server = StubMCP()
+        create_substance_tools(mock_server)
+        return mock_server.tools_by_name
+    
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        """Start every test with an empty substance cache"""
+        invalidate_substance_cache()
+        yield
+        invalidate_substance_cache()
+    
+    @pytest.fixture
+    def mock_supabase(self):
+        """Patch the substance tools' Supabase client with SUBSTANCE_ROWS"""
+        mock_client = FakeSupabase({SUBSTANCE_TABLE: SUBSTANCE_ROWS})
+        with patch("substance_tools.get_supabase", return_value=mock_client):
+            yield mock_client
+    
+    def test_patient_history_splits_active_and_inactive(
+        self, substance_tools, mock_supabase
+    ):
+        """Test a patient's records are split by use flag and risk-flagged"""
+        result = substance_tools["get_patient_substance_history"]("PT001")
+        
+        assert result["total_substances_tracked"] == 3
+        assert result["active_substance_count"] == 2
+        assert result["inactive_substance_count"] == 1
+        assert result["usage_patterns"] == {"Daily": ["Heroin"], "Weekly": ["Alcohol"]}
+        risk = result["risk_assessment"]
+        assert [s["substance"] for s in risk["high_risk_substances"]] == ["Heroin"]
+        assert [s["substance"] for s in risk["daily_use_substances"]] == ["Heroin"]
+        assert risk["multiple_active_substances"] is False
+    
+    def test_patient_history_tolerates_missing_pattern(self, substance_tools):
+        """Test an active record without a pattern of use is still reported"""
+        rows = [{"group_identifier": "PT004", "substance": "Alcohol",
+                 "use_flag": 1, "pattern_of_use": None}]
+        with patch("substance_tools.get_supabase", return_value=FakeSupabase({SUBSTANCE_TABLE: rows})):
+            result = substance_tools["get_patient_substance_history"]("PT004")
+        
+        assert result["active_substance_count"] == 1
+        assert result["usage_patterns"] == {None: ["Alcohol"]}
+        assert result["risk_assessment"]["daily_use_substances"] == []
+    
+    def test_patient_history_returns_fetched_records(self, substance_tools):
+        """Test records are passed through without copies or NaN conversion"""
+        rows = [
+            {"group_identifier": "PT004", "substance": "Alcohol",
+             "use_flag": 1, "pattern_of_use": "Weekly", "age_first_use": None},
+            {"group_identifier": "PT004", "substance": "Tobacco",
+             "use_flag": 0, "pattern_of_use": None, "age_first_use": 14},
+        ]
+        with patch("substance_tools.get_supabase", return_value=FakeSupabase({SUBSTANCE_TABLE: rows})):
+            result = substance_tools["get_patient_substance_history"]("PT004")
+        
+        assert result["active_substances"][0] is rows[0]
+        assert result["inactive_substances"][0] is rows[1]
+        assert result["active_substances"][0]["age_first_use"] is None
+    
+    def test_unknown_patient(self, substance_tools, mock_supabase):
+        """Test a patient without records gets a message"""
+        result = substance_tools["get_patient_substance_history"]("PT999")
+        
+        assert "No substance use history found" in result["message"]
+    
+    def test_patient_history_is_cached(self, substance_tools, mock_supabase):
+        """Test repeat requests for a patient do not query again"""
+        first = substance_tools["get_patient_substance_history"]("PT001")
+        second = substance_tools["get_patient_substance_history"]("PT001")
+        
+        assert second == first
+        assert mock_supabase.queries == 1
+        
+        substance_tools["get_patient_substance_history"]("PT002")
+        assert mock_supabase.queries == 2
+    
+    def test_timeline_reuses_patient_history(self, substance_tools, mock_supabase):
+        """Test the timeline wraps the cached history without querying again"""
+        history = substance_tools["get_patient_substance_history"]("PT001")
+        timeline = substance_tools["get_substance_use_timeline"]("PT001")
+        
+        assert timeline["current_status"] == history
+        assert mock_supabase.queries == 1
+    
+    def test_population_tools_share_one_fetch(self, substance_tools, mock_supabase):
+        """Test population tools reuse one cached copy of the whole table"""
+        patterns = asyncio.run(
+            substance_tools["analyze_substance_patterns_across_patients"]()
+        )
+        high_risk = asyncio.run(substance_tools["get_high_risk_substance_users"]())
+        
+        assert mock_supabase.queried.count(SUBSTANCE_TABLE) == 1
+        assert patterns["population_analysis"]["total_patients"] == 3
+        assert patterns["population_analysis"]["total_substance_records"] == 7
+        assert patterns["risk_indicators"]["patients_with_daily_use"] == 1
+        assert high_risk["high_risk_patient_count"] == 2
+    
+    def test_invalidate_forces_refetch(self, substance_tools, mock_supabase):
+        """Test invalidating the cache makes the next call query again"""
+        asyncio.run(substance_tools["get_high_risk_substance_users"]())
+        invalidate_substance_cache()
+        asyncio.run(substance_tools["get_high_risk_substance_users"]())
+        
+        assert mock_supabase.queried.count(SUBSTANCE_TABLE) == 2
+    
+    def test_high_risk_scoring(self, substance_tools, mock_supabase):
+        """Test risk scores, factors and ordering of high-risk users"""
+        result = asyncio.run(substance_tools["get_high_risk_substance_users"]())
+        
+        patients = {p["patient_id"]: p for p in result["patients"]}
+        assert [p["patient_id"] for p in result["patients"]] == ["PT001", "PT002"]
+        assert patients["PT001"]["risk_score"] == 5
+        assert patients["PT001"]["risk_factors"] == [
+            "Uses high-risk substances",
+            "Daily/continued use pattern",
+        ]
+        assert patients["PT002"]["risk_score"] == 3
+        assert patients["PT002"]["substance_count"] == 3
+        assert patients["PT002"]["active_substances"] == [
+            "Alcohol",
+            "Cannabis",
+            "Tobacco",
+        ]
+    
+    def test_high_risk_uses_database_aggregation(self, substance_tools):
+        """Test high-risk users are scored from the RPC's per-patient rows"""
+        mock_client = FakeSupabase({
+            SUBSTANCE_TABLE: SUBSTANCE_ROWS,
+            "high_risk_substance_users": [
+                {
+                    "group_identifier": "PT002",
+                    "substance_count": 3,
+                    "active_substances": ["Alcohol", "Cannabis", "Tobacco"],
+                    "uses_high_risk_substance": False,
+                    "has_daily_use": True,
+                }
+            ],
+        })
+        
+        with patch("substance_tools.get_supabase", return_value=mock_client):
+            result = asyncio.run(substance_tools["get_high_risk_substance_users"]())
+        
+        assert mock_client.queried == ["high_risk_substance_users"]
+        assert result["high_risk_patient_count"] == 1
+        assert result["patients"][0]["risk_score"] == 3
+    
+    @pytest.mark.parametrize(
+        "tables, expected",
+        [
+            ({SUBSTANCE_TABLE: []}, {"message": "No substance use data found"}),
+            (
+                {SUBSTANCE_TABLE: [], "high_risk_substance_users": []},
+                {"message": "No substance use data found"},
+            ),
+            (
+                {SUBSTANCE_TABLE: SUBSTANCE_ROWS[-1:], "high_risk_substance_users": []},
+                {"high_risk_patient_count": 0, "patients": []},
+            ),
+        ],
+        ids=["empty_table", "empty_table_with_function", "no_high_risk_patients"],
+    )
+    def test_high_risk_without_data(self, substance_tools, tables, expected):
+        """Test only an empty table reports that there is no substance data"""
+        with patch("substance_tools.get_supabase", return_value=FakeSupabase(tables)):
+            result = asyncio.run(substance_tools["get_high_risk_substance_users"]())
+        
+        assert {key: result[key] for key in expected} == expected
+    
+    def test_compare_high_and_low_substance_use(self, substance_tools):
+        """Test bucket averages use each patient's latest assessment"""
+        mock_client = FakeSupabase({
+            SUBSTANCE_TABLE: SUBSTANCE_ROWS,
+            "PTSD": [
+                {"unique_id": "a1", "group_identifier": "PT002",
+                 "assessment_date": "2024-01-01", "total": 10, "sleep": None},
+                {"unique_id": "a2", "group_identifier": "PT002",
+                 "assessment_date": "2024-06-01", "total": 40, "sleep": 3.0},
+                {"unique_id": "a3", "group_identifier": "PT003",
+                 "assessment_date": "2024-03-01", "total": 20, "sleep": None},
+            ],
+        })
+        
+        with patch("substance_tools.get_supabase", return_value=mock_client):
+            result = asyncio.run(
+                substance_tools["compare_substance_use_by_assessment_scores"]("ptsd")
+            )
+        
+        comparison = result["high_vs_low_substance_use"]
+        assert result["patient_count"] == 2
+        assert comparison["total"] == {
+            "high_substance_use_avg": 40.0,
+            "low_substance_use_avg": 20.0,
+            "difference": 20.0,
+        }
+        assert comparison["active_substance_count"]["difference"] == 2.0
+        assert "sleep" not in comparison
+    
+    def test_compare_orders_mixed_date_shapes(self, substance_tools):
+        """Test timestamps, bare dates, offsets and missing dates all take part"""
+        mock_client = FakeSupabase({
+            SUBSTANCE_TABLE: SUBSTANCE_ROWS,
+            "PTSD": [
+                {"unique_id": "a1", "group_identifier": "PT002",
+                 "assessment_date": "2024-01-15T10:00:00+00:00", "total": 10},
+                {"unique_id": "a2", "group_identifier": "PT002",
+                 "assessment_date": "2024-02-01", "total": 40},
+                {"unique_id": "a3", "group_identifier": "PT002",
+                 "assessment_date": None, "total": 99},
+                {"unique_id": "a4", "group_identifier": "PT003",
+                 "assessment_date": "2024-01-01T00:00:00-08:00", "total": 5},
+                {"unique_id": "a5", "group_identifier": "PT003",
+                 "assessment_date": "2024-03-01T00:00:00+05:00", "total": 20},
+                {"unique_id": "a6", "group_identifier": "PT001",
+                 "assessment_date": None, "total": 30},
+            ],
+        })
+        
+        with patch("substance_tools.get_supabase", return_value=mock_client):
+            result = asyncio.run(
+                substance_tools["compare_substance_use_by_assessment_scores"]("ptsd")
+            )
+        
+        # PT001 has only an undated assessment and is still compared
+        assert result["patient_count"] == 3
+        assert result["high_vs_low_substance_use"]["total"] == {
+            "high_substance_use_avg": 40.0,
+            "low_substance_use_avg": 20.0,
+            "difference": 20.0,
+        }
+    
+    def test_population_analysis_uses_database_aggregation(self, substance_tools):
+        """Test the population analysis returns the RPC's summary as-is"""
+        stats = {
+            "population_analysis": {
+                "total_patients": 2,
+                "total_substance_records": 4,
+                "patients_with_active_use": 2,
+                "high_risk_patients": 1,
+            },
+            "most_common_substances": {"Alcohol": 2},
+            "usage_patterns": {"Weekly": 3},
+            "risk_indicators": {
+                "patients_with_multiple_substances": 1,
+                "patients_with_daily_use": 0,
+                "average_substances_per_patient": 2.0,
+            },
+        }
+        mock_client = FakeSupabase(
+            {SUBSTANCE_TABLE: SUBSTANCE_ROWS, "substance_population_stats": stats}
+        )
+        
+        with patch("substance_tools.get_supabase", return_value=mock_client):
+            result = asyncio.run(
+                substance_tools["analyze_substance_patterns_across_patients"]()
+            )
+        
+        assert mock_client.queried == ["substance_population_stats"]
+        assert result == stats
@@ -1,21 +1,24 @@
 -- Healthcare Dashboard Critical Indexes
 -- Run these in Supabase SQL Editor for immediate performance boost
 -- Estimated execution time: 1-2 minutes total
+-- CONCURRENTLY cannot run inside a transaction block, so run each
+-- statement on its own rather than the whole file at once
 
 -- 1. Assessment tables - most critical for dashboard queries
-CREATE INDEX idx_ptsd_patient_date ON "PTSD" (group_identifier, assessment_date DESC);
-CREATE INDEX idx_phq_patient_date ON "PHQ" (group_identifier, assessment_date DESC);
-CREATE INDEX idx_gad_patient_date ON "GAD" (group_identifier, assessment_date DESC);
-CREATE INDEX idx_who_patient_date ON "WHO" (group_identifier, assessment_date DESC);
-CREATE INDEX idx_ders_patient_date ON "DERS" (group_identifier, assessment_date DESC);
-CREATE INDEX idx_php_patient_date ON "PHP" (group_identifier, assessment_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ptsd_patient_date ON "PTSD" (group_identifier, assessment_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_phq_patient_date ON "PHQ" (group_identifier, assessment_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_gad_patient_date ON "GAD" (group_identifier, assessment_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_who_patient_date ON "WHO" (group_identifier, assessment_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ders_patient_date ON "DERS" (group_identifier, assessment_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_php_patient_date ON "PHP" (group_identifier, assessment_date DESC);
 
 -- 2. Handle DERS_2 table as well (if it exists)
-CREATE INDEX idx_ders2_patient_date ON "DERS_2" (group_identifier, assessment_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ders2_patient_date ON "DERS_2" (group_identifier, assessment_date DESC);
 
 -- 3. Patient-related tables
 CREATE INDEX idx_bps_patient ON "BPS" (group_identifier);
-CREATE INDEX idx_substance_patient ON "Patient Substance History" (group_identifier, use_flag);
+-- INCLUDE makes the active-substance lookups index-only scans
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_substance_patient ON "Patient Substance History" (group_identifier) INCLUDE (use_flag, substance);
 CREATE INDEX idx_stats_identifier ON "STATS TEST" (group_identifier);
 
 -- 4. Patient intake history
@@ -40,6 +43,18 @@ CREATE INDEX idx_ders2_assessment_date ON "DERS_2" (assessment_date DESC);
 CREATE INDEX idx_php_assessment_date ON "PHP" (assessment_date DESC);
 
 -- NOTES:
+-- - Check a lookup uses its index, e.g. expect "Index Scan using
+--   idx_ptsd_patient_date" from:
+--   EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM "PTSD"
+--   WHERE group_identifier = '...' ORDER BY assessment_date DESC LIMIT 1;
+-- - An idx_substance_patient built on (group_identifier, use_flag) by an
+--   earlier version of this file must be dropped first to get the INCLUDE form
+-- - Per-patient substance history reads (WHERE group_identifier = '...')
+--   already use the primary key (group_identifier, substance) or
+--   idx_substance_patient; no other substance index on group_identifier
+--   is needed. Check with:
+--   EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM "Patient Substance History"
+--   WHERE group_identifier = '...';
 -- - CONCURRENTLY prevents table locking during index creation
 -- - These indexes will speed up queries by 10-100x
 -- - Total execution time: 2-3 minutes depending on data size